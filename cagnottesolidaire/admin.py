@@ -1,9 +1,268 @@
 """Register Cagnotte Solidaire models in django admin."""
-from django.contrib.admin import site
+from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.utils import timezone
 
-from .models import Cagnotte, Demande, Offre, Proposition
+from .models import (
+    ArchivedDemande,
+    ArchivedOffre,
+    ArchivedProposition,
+    Cagnotte,
+    Demande,
+    Notification,
+    Offre,
+    OutgoingMail,
+    Preference,
+    Proposition,
+)
 
-site.register(Cagnotte)
-site.register(Proposition)
-site.register(Offre)
-site.register(Demande)
+
+@admin.register(Cagnotte)
+class CagnotteAdmin(admin.ModelAdmin):
+    """Cagnottes, with their stored totals and the number of their Propositions."""
+
+    list_display = (
+        "name",
+        "responsable",
+        "fin_depot",
+        "fin_achat",
+        "etat",
+        "propositions",
+        "nb_offres",
+        "total_promis",
+        "total_encaisse",
+    )
+    list_filter = ("etat",)
+    list_select_related = ("responsable",)
+    autocomplete_fields = ("responsable",)
+    search_fields = ("name",)
+    date_hierarchy = "fin_achat"
+    show_full_result_count = False
+    actions = ("recompute_totals",)
+
+    def get_queryset(self, request) -> QuerySet:
+        """Count the Propositions in the changelist query."""
+        queryset = super().get_queryset(request)
+        return queryset.annotate(n_propositions=Count("proposition"))
+
+    @admin.display(description="propositions", ordering="n_propositions")
+    def propositions(self, obj: Cagnotte) -> int:
+        """Get the annotated number of Propositions."""
+        return obj.n_propositions
+
+    @admin.action(description="Recalculer les totaux")
+    def recompute_totals(self, request, queryset: QuerySet):
+        """Rebuild the stored totals of the selected Cagnottes."""
+        count = Cagnotte.objects.filter(pk__in=queryset.values("pk")).recompute_totals()
+        self.message_user(request, f"{count} cagnotte(s) recalculée(s)")
+
+
+@admin.register(Proposition)
+class PropositionAdmin(admin.ModelAdmin):
+    """Propositions, with their numbers of Offres and valid sum."""
+
+    list_display = (
+        "name",
+        "cagnotte",
+        "responsable",
+        "prix",
+        "beneficiaires",
+        "restants",
+        "valides",
+        "somme",
+    )
+    list_select_related = ("cagnotte", "responsable")
+    autocomplete_fields = ("cagnotte", "responsable")
+    search_fields = ("name", "cagnotte__name")
+    date_hierarchy = "cagnotte__fin_achat"
+    show_full_result_count = False
+    actions = ("recompute_restants",)
+
+    def get_queryset(self, request) -> QuerySet:
+        """Compute the Offres stats in the changelist query."""
+        return super().get_queryset(request).with_offer_stats()
+
+    @admin.display(description="offres validées", ordering="offres_valides")
+    def valides(self, obj: Proposition) -> int:
+        """Get the annotated number of valid Offres."""
+        return obj.offres_valides
+
+    @admin.display(description="somme", ordering="offres_somme")
+    def somme(self, obj: Proposition):
+        """Get the annotated sum of the valid Offres."""
+        return obj.offres_somme
+
+    @admin.action(description="Recalculer les places restantes")
+    def recompute_restants(self, request, queryset: QuerySet):
+        """Rebuild the remaining places of the selected Propositions."""
+        propositions = Proposition.objects.filter(pk__in=queryset.values("pk"))
+        count = propositions.recompute_restants()
+        self.message_user(request, f"{count} proposition(s) recalculée(s)")
+
+
+@admin.register(Offre)
+class OffreAdmin(admin.ModelAdmin):
+    """Offres, with bulk transitions keeping the places and totals in sync."""
+
+    list_display = (
+        "pk",
+        "beneficiaire",
+        "proposition",
+        "cagnotte",
+        "prix",
+        "valide",
+        "paye",
+    )
+    list_filter = ("valide", "paye")
+    list_select_related = ("beneficiaire", "proposition__cagnotte")
+    raw_id_fields = ("proposition",)
+    autocomplete_fields = ("beneficiaire",)
+    search_fields = ("beneficiaire__username", "proposition__name")
+    date_hierarchy = "proposition__cagnotte__fin_achat"
+    show_full_result_count = False
+    actions = ("accepter", "refuser", "encaisser")
+
+    @admin.display(description="cagnotte", ordering="proposition__cagnotte__name")
+    def cagnotte(self, obj: Offre) -> Cagnotte:
+        """Get the Cagnotte of this Offre."""
+        return obj.proposition.cagnotte
+
+    def transition(self, request, queryset: QuerySet, name: str, verb: str):
+        """Apply a transition of OffreQuerySet to the selected Offres."""
+        pks = getattr(Offre.objects.filter(pk__in=queryset.values("pk")), name)()
+        self.message_user(request, f"{len(pks)} offre(s) {verb}(s)")
+
+    def delete_queryset(self, request, queryset: QuerySet):
+        """Delete the selected Offres through their transition, not QuerySet.delete."""
+        Offre.objects.filter(pk__in=queryset.values("pk")).supprimer()
+
+    @admin.action(description="Accepter les offres")
+    def accepter(self, request, queryset: QuerySet):
+        """Accept the selected Offres, while their Propositions have places."""
+        self.transition(request, queryset, "accepter", "acceptée")
+
+    @admin.action(description="Refuser les offres")
+    def refuser(self, request, queryset: QuerySet):
+        """Refuse the selected Offres."""
+        self.transition(request, queryset, "refuser", "refusée")
+
+    @admin.action(description="Marquer les offres comme payées")
+    def encaisser(self, request, queryset: QuerySet):
+        """Mark the selected accepted Offres as payed."""
+        self.transition(request, queryset, "encaisser", "payée")
+
+
+@admin.register(Demande)
+class DemandeAdmin(admin.ModelAdmin):
+    """Demandes, with their Cagnotte."""
+
+    list_display = ("description", "cagnotte", "demandeur")
+    list_select_related = ("cagnotte", "demandeur")
+    autocomplete_fields = ("cagnotte", "demandeur")
+    search_fields = ("description",)
+    show_full_result_count = False
+
+    def delete_queryset(self, request, queryset: QuerySet):
+        """Delete the selected Demandes, and mark each of their Cagnottes once."""
+        with transaction.atomic():
+            cagnottes = set(queryset.values_list("cagnotte", flat=True))
+            queryset.delete()
+            Cagnotte.objects.filter(pk__in=cagnottes).add_totals()
+
+
+@admin.register(OutgoingMail)
+class OutgoingMailAdmin(admin.ModelAdmin):
+    """Mails of the outbox, which may be sent again."""
+
+    list_display = ("sujet", "destinataire", "statut", "tentatives", "prochain_essai")
+    list_filter = ("statut",)
+    search_fields = ("destinataire", "sujet")
+    date_hierarchy = "prochain_essai"
+    show_full_result_count = False
+    actions = ("renvoyer",)
+
+    @admin.action(description="Renvoyer les mails")
+    def renvoyer(self, request, queryset: QuerySet):
+        """Put the selected mails back in the outbox, for a new round of attempts."""
+        count = queryset.update(
+            statut=OutgoingMail.Statut.EN_ATTENTE,
+            tentatives=0,
+            prochain_essai=timezone.now(),
+            erreur="",
+        )
+        self.message_user(request, f"{count} mail(s) remis dans la file")
+
+
+@admin.register(Preference)
+class PreferenceAdmin(admin.ModelAdmin):
+    """Notification preferences of the users."""
+
+    list_display = ("user", "frequence")
+    list_filter = ("frequence",)
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+    search_fields = ("user__username",)
+    show_full_result_count = False
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """Notifications waiting for the next digest of their destinataire."""
+
+    list_display = ("destinataire", "offre", "creee")
+    list_select_related = (
+        "destinataire",
+        "offre__beneficiaire",
+        "offre__proposition__cagnotte",
+    )
+    raw_id_fields = ("offre",)
+    autocomplete_fields = ("destinataire",)
+    search_fields = ("destinataire__username",)
+    date_hierarchy = "creee"
+    show_full_result_count = False
+
+
+class ArchiveAdmin(admin.ModelAdmin):
+    """Read-only archives, filled by the archive_cagnottes command."""
+
+    show_full_result_count = False
+
+    def has_add_permission(self, request) -> bool:
+        """Leave the archives to archive_cagnottes."""
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        """Keep the archives frozen."""
+        return False
+
+    def has_delete_permission(self, request, obj=None) -> bool:
+        """Keep the archives frozen."""
+        return False
+
+
+@admin.register(ArchivedProposition)
+class ArchivedPropositionAdmin(ArchiveAdmin):
+    """Archived Propositions, with their frozen Offres stats."""
+
+    list_display = ("name", "cagnotte", "prix", "offres_valides", "offres_somme")
+    list_select_related = ("cagnotte",)
+    search_fields = ("name", "cagnotte__name")
+
+
+@admin.register(ArchivedOffre)
+class ArchivedOffreAdmin(ArchiveAdmin):
+    """Archived Offres."""
+
+    list_display = ("pk", "beneficiaire", "proposition", "prix", "valide", "paye")
+    list_filter = ("valide", "paye")
+    list_select_related = ("beneficiaire", "proposition")
+    search_fields = ("beneficiaire__username", "proposition__name")
+
+
+@admin.register(ArchivedDemande)
+class ArchivedDemandeAdmin(ArchiveAdmin):
+    """Archived Demandes."""
+
+    list_display = ("description", "cagnotte", "demandeur")
+    list_select_related = ("cagnotte", "demandeur")
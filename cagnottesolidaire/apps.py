@@ -7,3 +7,7 @@ class CagnotteSolidaireConfig(AppConfig):
 
     name = "cagnottesolidaire"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        """Connect the signals keeping the search index in sync."""
+        from . import search  # noqa: F401
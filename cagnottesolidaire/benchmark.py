@@ -0,0 +1,128 @@
+"""Benchmark the views of the Cagnotte Solidaire django application."""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls
+from .models import Cagnotte
+
+
+def url_kwargs() -> dict[str, dict]:
+    """Get the kwargs of every named URL, for the biggest Cagnotte of the database."""
+    cagnotte = (
+        Cagnotte.objects.annotate(n=Count("proposition__offre"))
+        .order_by("-n", "pk")
+        .first()
+    )
+    proposition = (
+        cagnotte.proposition_set.annotate(n=Count("offre")).order_by("-n", "pk").first()
+    )
+    offre = proposition.offre_set.order_by("pk").first()
+    demande = cagnotte.demande_set.order_by("pk").first()
+    in_cagnotte = {"slug": cagnotte.slug}
+    in_proposition = {"p_slug": cagnotte.slug, "slug": proposition.slug}
+    return {
+        "cagnotte_list": {},
+        "cagnotte_archives": {},
+        "recherche": {},
+        "cagnotte_create": {},
+        "cagnotte": in_cagnotte,
+        "cagnotte_progres": in_cagnotte,
+        "cagnotte_propositions": in_cagnotte,
+        "cagnotte_demandes": in_cagnotte,
+        "cagnotte_tresorerie": in_cagnotte,
+        "proposition_create": in_cagnotte,
+        "proposition": in_proposition,
+        "offre_create": in_proposition,
+        "offres_proposition": in_proposition,
+        "offres_paye": in_cagnotte,
+        "rapprochement": in_cagnotte,
+        "offre_export": in_cagnotte,
+        "offre_list": {},
+        "offre": {"pk": offre.pk},
+        "offre_ok": {"pk": offre.pk},
+        "offre_ko": {"pk": offre.pk},
+        "offre_paye": {"pk": offre.pk},
+        "offre_remarques": {"pk": offre.pk},
+        "proposition_list": {},
+        "preferences": {},
+        "cagnotte_api": in_cagnotte,
+        "proposition_api": in_proposition,
+        "demande_create": in_cagnotte,
+        "demande_delete": {"pk": demande.pk},
+    }
+
+
+def measure(client: Client, url: str, repeat: int) -> dict:
+    """Get the status, number of queries and wall times of GET requests on an url."""
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(1000 * (time.perf_counter() - start))
+    return {
+        "status": response.status_code,
+        "queries": len(queries),
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+    }
+
+
+def run(repeat: int = 5) -> dict[str, dict]:
+    """Time every named URL of the application on the current database.
+
+    Requests are made by a staff user, so that the treasurer tables are rendered, and
+    who is not responsable of anything, so that nothing is modified.
+    """
+    client = Client()
+    user, _ = User.objects.get_or_create(username="benchmark", is_staff=True)
+    client.force_login(user)
+    kwargs = url_kwargs()
+    return {
+        pattern.name: measure(
+            client,
+            reverse(f"{urls.app_name}:{pattern.name}", kwargs=kwargs[pattern.name]),
+            repeat,
+        )
+        for pattern in urls.urlpatterns
+    }
+
+
+def fetch(url: str, headers: dict[str, str]) -> tuple[int, float]:
+    """Get the status and the wall time of a GET request on a running server."""
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers)) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    return status, 1000 * (time.perf_counter() - start)
+
+
+def load(url: str, clients: int, requests: int, headers=None) -> dict:
+    """Get the throughput and the latencies of a server under concurrent clients."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(
+            executor.map(fetch, [url] * requests, [headers or {}] * requests),
+        )
+    duration = time.perf_counter() - start
+    timings = sorted(timing for _, timing in results)
+    return {
+        "requests": requests,
+        "errors": sum(status >= 500 for status, _ in results),
+        "rps": round(requests / duration, 1),
+        "median_ms": round(statistics.median(timings), 2),
+        "p99_ms": round(timings[min(len(timings) - 1, int(0.99 * len(timings)))], 2),
+    }
@@ -0,0 +1,219 @@
+"""Cache of the anonymous pages and of fragments, invalidated by versions.
+
+Each Cagnotte has a version in the cache, keyed by its slug, which changes on every
+write of the Cagnotte, its Propositions, Offres and Demandes, and the list of the
+Cagnottes has its own. A cached page or fragment remembers the version it was
+rendered at, so that a hit takes a single get_many of it and of the current version.
+"""
+import hashlib
+from collections.abc import Callable
+from datetime import date
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+LIST = "*"
+# lazy references, as the models bump the versions of their bulk updates
+CAGNOTTE = "cagnottesolidaire.Cagnotte"
+PROPOSITION = "cagnottesolidaire.Proposition"
+SAFE_METHODS = ("GET", "HEAD")
+# fragments of the templates, see the fragment template tag
+FRAGMENTS = ["propositions", "tresorerie"]
+
+
+def enabled() -> bool:
+    """Tell if the page cache is enabled, with CAGNOTTESOLIDAIRE_PAGE_CACHE."""
+    return getattr(settings, "CAGNOTTESOLIDAIRE_PAGE_CACHE", False)
+
+
+def fragments_enabled() -> bool:
+    """Tell if the fragment cache is enabled, with CAGNOTTESOLIDAIRE_FRAGMENT_CACHE."""
+    return getattr(settings, "CAGNOTTESOLIDAIRE_FRAGMENT_CACHE", False)
+
+
+def versioned() -> bool:
+    """Tell if the versions must be maintained."""
+    return enabled() or fragments_enabled()
+
+
+def get_cache():
+    """Get the cache of the pages, from CAGNOTTESOLIDAIRE_PAGE_CACHE_ALIAS."""
+    return caches[getattr(settings, "CAGNOTTESOLIDAIRE_PAGE_CACHE_ALIAS", "default")]
+
+
+def version_key(scope: str) -> str:
+    """Get the cache key of the version of a Cagnotte, or of the list."""
+    return f"cagnottesolidaire:version:{scope}"
+
+
+def page_key(request: HttpRequest) -> str:
+    """Get the cache key of a page, which also depends on the date."""
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"cagnottesolidaire:page:{request.method}:{path}:{date.today()}"
+
+
+def bump(*scopes: str):
+    """Change the versions of these Cagnotte slugs, or of the list.
+
+    They are changed now, and again after the commit, so that a page rendered from
+    the data before the commit is not kept.
+    """
+    if not versioned() or not scopes:
+        return
+
+    def set_versions():
+        get_cache().set_many(
+            {version_key(scope): uuid4().hex for scope in scopes},
+            timeout=None,
+        )
+
+    set_versions()
+    transaction.on_commit(set_versions)
+
+
+def bump_cagnottes(cagnottes):
+    """Change the versions of the Cagnottes of a queryset."""
+    if versioned():
+        bump(*cagnottes.values_list("slug", flat=True))
+
+
+def current_version(cache, scope: str) -> str:
+    """Get the version of a scope, starting a new one if it was evicted."""
+    key = version_key(scope)
+    cache.add(key, uuid4().hex, timeout=None)
+    return cache.get(key)
+
+
+def anonymous_page(view):
+    """Serve the pages of anonymous visitors from the cache, when enabled.
+
+    The version of a page is the one of the Cagnotte in its slug or p_slug
+    kwarg, or the one of the list of the Cagnottes.
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if (
+            not enabled()
+            or request.method not in SAFE_METHODS
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        cache = get_cache()
+        scope = kwargs.get("p_slug") or kwargs.get("slug") or LIST
+        key = page_key(request)
+        found = cache.get_many([key, version_key(scope)])
+        page, version = found.get(key), found.get(version_key(scope))
+        if page is not None and version is not None and page[0] == version:
+            _, status, headers, content = page
+            response = HttpResponse(content, status=status)
+            for header, value in headers:
+                response[header] = value
+            return get_conditional_response(
+                request,
+                etag=response.get("ETag"),
+                last_modified=parse_http_date_safe(response.get("Last-Modified", "")),
+                response=response,
+            )
+        # read the version before the data, so that a concurrent write changes it
+        version = current_version(cache, scope)
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        if response.status_code == 200 and not response.cookies:
+            cache.set(
+                key,
+                (
+                    version,
+                    response.status_code,
+                    list(response.items()),
+                    response.content,
+                ),
+                getattr(settings, "CAGNOTTESOLIDAIRE_PAGE_CACHE_SECONDS", 3600),
+            )
+        return response
+
+    return wrapper
+
+
+def fragment(name: str, scope: str, vary: list, render: Callable[[], str]) -> str:
+    """Get a fragment of template for a Cagnotte from the cache, or render it.
+
+    Fragments also depend on the date, and on the values given in vary. Their hits
+    and misses are counted, for fragment_stats.
+    """
+    cache = get_cache()
+    parts = ":".join(str(value) for value in vary)
+    digest = hashlib.md5(parts.encode()).hexdigest()
+    key = f"cagnottesolidaire:fragment:{name}:{scope}:{digest}:{date.today()}"
+    found = cache.get_many([key, version_key(scope)])
+    cached, version = found.get(key), found.get(version_key(scope))
+    if cached is not None and version is not None and cached[0] == version:
+        count(cache, name, "hit")
+        return cached[1]
+    version = current_version(cache, scope)
+    html = render()
+    cache.set(
+        key,
+        (version, html),
+        getattr(settings, "CAGNOTTESOLIDAIRE_FRAGMENT_CACHE_SECONDS", 3600),
+    )
+    count(cache, name, "miss")
+    return html
+
+
+def count_key(name: str, outcome: str) -> str:
+    """Get the cache key of the counter of hits or misses of a fragment."""
+    return f"cagnottesolidaire:fragment_stats:{name}:{outcome}"
+
+
+def count(cache, name: str, outcome: str):
+    """Count a hit or a miss of a fragment."""
+    key = count_key(name, outcome)
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def fragment_stats(names: list[str]) -> dict[str, dict]:
+    """Get the hits, misses and hit ratio of fragments."""
+    cache = get_cache()
+    keys = [count_key(name, outcome) for name in names for outcome in ("hit", "miss")]
+    counts = cache.get_many(keys)
+    stats = {}
+    for name in names:
+        hits = counts.get(count_key(name, "hit"), 0)
+        misses = counts.get(count_key(name, "miss"), 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "ratio": round(hits / total, 3) if total else None,
+        }
+    return stats
+
+
+@receiver(post_save, sender=CAGNOTTE, dispatch_uid="pages_cagnotte")
+@receiver(post_delete, sender=CAGNOTTE, dispatch_uid="pages_cagnotte_del")
+def bump_cagnotte(sender, instance, **kwargs):
+    """Change the version of a Cagnotte and of the list when it is written.
+
+    Offres and Demandes change the versions of their Cagnotte in add_totals, which
+    also covers their bulk updates, sending no signals.
+    """
+    bump(instance.slug, LIST)
+
+
+@receiver(post_save, sender=PROPOSITION, dispatch_uid="pages_proposition")
+@receiver(post_delete, sender=PROPOSITION, dispatch_uid="pages_proposition_del")
+def bump_proposition(sender, instance, **kwargs):
+    """Change the version of the Cagnotte of a Proposition when it is written."""
+    if versioned():
+        bump(instance.cagnotte.slug)
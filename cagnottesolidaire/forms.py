@@ -51,3 +51,13 @@ class OffreForm(forms.ModelForm):
                 f"Votre prix ({prix_user}) ne peut pas être inférieur à la demande "
                 "({prix_prop})",
             )
+
+
+class ReleveForm(forms.Form):
+    """Form to upload a bank statement, as CSV."""
+
+    releve = forms.FileField(label="Relevé bancaire (CSV)")
+    encodage = forms.ChoiceField(
+        choices=[("utf-8-sig", "UTF-8"), ("cp1252", "Windows / Latin-1")],
+        initial="utf-8-sig",
+    )
@@ -0,0 +1,118 @@
+"""Resized derivatives of the images of the Cagnotte Solidaire django application."""
+import hashlib
+import io
+import logging
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name: maximal width in pixels
+SIZES = {"card": 400, "detail": 800, "retina": 1600}
+# extension: (Pillow format, save options)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+WORKERS = getattr(settings, "CAGNOTTESOLIDAIRE_IMAGE_WORKERS", None)
+
+
+def content_hash(image: FieldFile) -> str:
+    """Get a short hash of the content of an image, uploaded or stored."""
+    sha = hashlib.sha256()
+    for chunk in image.chunks():
+        sha.update(chunk)
+    image.seek(0)
+    return sha.hexdigest()[:16]
+
+
+def derivative_name(name: str, size: str, ext: str) -> str:
+    """Get the name of a derivative, next to its original."""
+    return f"{name.rsplit('.', 1)[0]}_{size}.{ext}"
+
+
+def derivative_names(name: str) -> list[str]:
+    """Get the names of all the derivatives of an image."""
+    return [derivative_name(name, size, ext) for size in SIZES for ext in FORMATS]
+
+
+def resize(data: bytes, width: int) -> dict[str, bytes]:
+    """Shrink an image to a maximal width, and encode it in every format.
+
+    This runs in the workers of a process pool, so it only deals with bytes.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((width, width * 4))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        encoded = {}
+        for ext, (fmt, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, fmt, **options)
+            encoded[ext] = buffer.getvalue()
+    return encoded
+
+
+def generate(images: Iterable[FieldFile], workers: int | None = WORKERS) -> list:
+    """Generate and store the derivatives of these images, in a process pool.
+
+    With workers=0, everything is done in this process, as for a single upload.
+    Return the images done, skipping those Pillow can not read.
+    """
+    images = list(images)
+    tasks = []
+    failed = set()
+    for image in images:
+        try:
+            with image.open("rb") as f:
+                data = f.read()
+        except OSError as e:
+            logger.warning("no derivative for %s: %r", image.name, e)
+            failed.add(image.name)
+            continue
+        tasks += [(image, size, data, width) for size, width in SIZES.items()]
+    if workers == 0:
+        results = []
+        for _, _, data, width in tasks:
+            try:
+                results.append(resize(data, width))
+            except Exception as e:
+                results.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(resize, data, width) for _, _, data, width in tasks]
+            # keep the exceptions, to skip only the images which raised them
+            results = [future.exception() or future.result() for future in futures]
+    for (image, size, _, _), encoded in zip(tasks, results, strict=True):
+        if isinstance(encoded, Exception):
+            if image.name not in failed:
+                logger.warning("no derivative for %s: %r", image.name, encoded)
+                failed.add(image.name)
+            continue
+        for ext, content in encoded.items():
+            name = derivative_name(image.name, size, ext)
+            image.storage.delete(name)
+            image.storage.save(name, ContentFile(content))
+    return [image for image in images if image.name not in failed]
+
+
+def is_new(image: FieldFile) -> bool:
+    """Tell if an image was just uploaded, and is not yet saved to the storage."""
+    return bool(image) and not image._committed
+
+
+def url(image: FieldFile, size: str, ext: str) -> str:
+    """Get the url of a derivative of an image."""
+    return image.storage.url(derivative_name(image.name, size, ext))
+
+
+def srcset(image: FieldFile, sizes: Iterable[str], ext: str) -> str:
+    """Get the srcset attribute for some derivatives of an image in a format."""
+    return ", ".join(f"{url(image, size, ext)} {SIZES[size]}w" for size in sizes)
@@ -0,0 +1,196 @@
+"""Outbox for the mails of the Cagnotte Solidaire django application."""
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from ndh.utils import full_url
+
+from .models import Notification, Offre, OutgoingMail, Preference
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "CAGNOTTESOLIDAIRE_OUTBOX_MAX_ATTEMPTS", 5)
+BACKOFF = getattr(settings, "CAGNOTTESOLIDAIRE_OUTBOX_BACKOFF", timedelta(minutes=1))
+# longer than sending a batch
+LEASE = getattr(settings, "CAGNOTTESOLIDAIRE_OUTBOX_LEASE", timedelta(minutes=15))
+
+
+def render_mail(user: User, sujet: str, template: str, context: dict) -> OutgoingMail:
+    """Render the txt and html alternatives of a mail for this user."""
+    texte, html = (
+        get_template(f"{template}.{alt}").render(context) for alt in ["txt", "html"]
+    )
+    return OutgoingMail(destinataire=user.email, sujet=sujet, texte=texte, html=html)
+
+
+def enqueue(user: User, sujet: str, template: str, context: dict) -> OutgoingMail:
+    """Put a mail in the outbox, in the transaction of the caller."""
+    mail = render_mail(user, sujet, template, context)
+    mail.save()
+    return mail
+
+
+def enqueue_all(
+    sujet: str,
+    template: str,
+    contexts: list[tuple[User, dict]],
+) -> list[OutgoingMail]:
+    """Put one mail per (user, context) in the outbox, with a single query."""
+    return OutgoingMail.objects.bulk_create(
+        [render_mail(user, sujet, template, context) for user, context in contexts],
+    )
+
+
+def message(mail: OutgoingMail, connection) -> EmailMultiAlternatives:
+    """Build the message to send for this OutgoingMail."""
+    msg = EmailMultiAlternatives(
+        mail.sujet,
+        mail.texte,
+        to=[mail.destinataire],
+        connection=connection,
+    )
+    if mail.html:
+        msg.attach_alternative(mail.html, "text/html")
+    return msg
+
+
+def claim(batch_size: int) -> list[OutgoingMail]:
+    """Lease a batch of due mails to this worker, in a short transaction.
+
+    Their prochain_essai is pushed LEASE away, so that other workers skip them while
+    they are sent, and so that they are sent again if this worker dies.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        mails = list(
+            OutgoingMail.objects.select_for_update(skip_locked=True)
+            .filter(statut=OutgoingMail.Statut.EN_ATTENTE, prochain_essai__lte=now)
+            .order_by("prochain_essai")[:batch_size],
+        )
+        OutgoingMail.objects.filter(pk__in=[mail.pk for mail in mails]).update(
+            prochain_essai=now + LEASE,
+            updated=now,
+        )
+    return mails
+
+
+def send_batch(batch_size: int = 100) -> int:
+    """Send a batch of due mails from the outbox over a single connection.
+
+    The mails are claimed first, and sent outside of any transaction. Failed mails
+    are retried later with an exponential backoff, and abandoned after MAX_ATTEMPTS
+    tries. Return the number of mails processed.
+    """
+    mails = claim(batch_size)
+    if not mails:
+        return 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception:
+        # each mail will try to open it again, and report its own failure
+        logger.exception("outbox: connection failed")
+    for mail in mails:
+        try:
+            connection.send_messages([message(mail, connection)])
+        except Exception as e:
+            mail.tentatives += 1
+            mail.erreur = repr(e)
+            if mail.tentatives >= MAX_ATTEMPTS:
+                mail.statut = OutgoingMail.Statut.ABANDONNE
+                logger.error("outbox: abandon de %s", mail)
+            else:
+                delay = BACKOFF * 2 ** (mail.tentatives - 1)
+                mail.prochain_essai = timezone.now() + delay
+        else:
+            mail.statut = OutgoingMail.Statut.ENVOYE
+            mail.erreur = ""
+        mail.updated = timezone.now()
+    connection.close()
+    OutgoingMail.objects.bulk_update(
+        mails,
+        ["statut", "tentatives", "prochain_essai", "erreur", "updated"],
+    )
+    return len(mails)
+
+
+def frequence(user: User) -> int:
+    """Get how often a User wants to be told about new Offres."""
+    try:
+        return user.preference.frequence
+    except Preference.DoesNotExist:
+        return Preference.Frequence.IMMEDIATE
+
+
+def notify_offre(offre: Offre):
+    """Tell the responsable of its Proposition about a new Offre, now or in a digest.
+
+    Use select_related("proposition__responsable__preference") to avoid a query.
+    """
+    responsable = offre.proposition.responsable
+    if frequence(responsable) == Preference.Frequence.IMMEDIATE:
+        enqueue(
+            responsable,
+            "Nouvelle offre sur votre proposition !",
+            "cagnottesolidaire/mails/offre_create",
+            {"offre": offre},
+        )
+    else:
+        Notification.objects.create(destinataire=responsable, offre=offre)
+
+
+def send_digests(periode: int) -> int:
+    """Put one digest mail per destinataire with this frequence in the outbox.
+
+    The pending Notifications are fetched with a single query, grouped by
+    destinataire, and deleted with the mails queued. The hourly digests also take the
+    Notifications of the users back to immediate mails. Return the number of mails.
+    """
+    destinataires = Q(destinataire__preference__frequence=periode)
+    if periode == Preference.Frequence.HORAIRE:
+        destinataires |= Q(destinataire__preference__isnull=True) | Q(
+            destinataire__preference__frequence=Preference.Frequence.IMMEDIATE,
+        )
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.filter(destinataires)
+            .select_for_update(of=("self",))
+            .select_related(
+                "destinataire",
+                "offre__beneficiaire",
+                "offre__proposition__cagnotte",
+            )
+            .order_by("destinataire", "pk"),
+        )
+        contexts = [
+            (
+                destinataire,
+                {
+                    "destinataire": destinataire,
+                    "offres": [notification.offre for notification in group],
+                    "preferences": full_url(reverse("cagnottesolidaire:preferences")),
+                },
+            )
+            for destinataire, group in groupby(
+                notifications,
+                key=lambda notification: notification.destinataire,
+            )
+        ]
+        enqueue_all(
+            "Nouvelles offres sur vos propositions",
+            "cagnottesolidaire/mails/digest",
+            contexts,
+        )
+        Notification.objects.filter(
+            pk__in=[notification.pk for notification in notifications],
+        ).delete()
+    return len(contexts)
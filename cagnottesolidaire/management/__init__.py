@@ -0,0 +1 @@
+"""Management commands for the Cagnotte Solidaire django application."""
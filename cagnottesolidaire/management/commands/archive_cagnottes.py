@@ -0,0 +1,41 @@
+"""Move the Cagnottes closed for long to the archive tables."""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...models import Cagnotte
+
+ARCHIVE_DAYS = getattr(settings, "CAGNOTTESOLIDAIRE_ARCHIVE_DAYS", 365)
+
+
+class Command(BaseCommand):
+    """Archive the Propositions, Offres and Demandes of the Cagnottes closed for long.
+
+    Each batch of Cagnottes is moved in its own transaction, so that the live tables
+    are only locked briefly.
+    """
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the horizon and the batches."""
+        parser.add_argument(
+            "--jours",
+            type=int,
+            default=ARCHIVE_DAYS,
+            help="archive the Cagnottes closed for more than this number of days",
+        )
+        parser.add_argument("--batch-size", type=int, default=10)
+
+    def handle(self, *args, jours, batch_size, **options):
+        """Archive the Cagnottes by batches, the oldest first."""
+        horizon = date.today() - timedelta(days=jours)
+        archivables = Cagnotte.objects.filter(
+            archivee=False,
+            fin_achat__lt=horizon,
+        ).order_by("fin_achat", "pk")
+        archived = 0
+        while pks := list(archivables.values_list("pk", flat=True)[:batch_size]):
+            archived += Cagnotte.objects.filter(pk__in=pks).archiver()
+        self.stdout.write(f"{archived} cagnotte(s) archivée(s)")
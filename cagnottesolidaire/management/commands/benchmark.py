@@ -0,0 +1,63 @@
+"""Benchmark the views on synthetic datasets."""
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from ...benchmark import run
+
+
+class Command(BaseCommand):
+    """Time every named URL at several scales, and output a JSON report.
+
+    Each scale is seeded with seed_benchmark_data in a throwaway test database.
+    """
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the scales and the report."""
+        parser.add_argument(
+            "--scales",
+            type=int,
+            nargs="+",
+            default=[1_000, 10_000, 100_000],
+            help="numbers of offres",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="path of the JSON report")
+
+    def handle(self, *args, scales, repeat, seed, output, **options):
+        """Seed and measure each scale."""
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False,
+        )
+        report = {}
+        try:
+            for scale in scales:
+                call_command("flush", interactive=False, verbosity=0)
+                call_command(
+                    "seed_benchmark_data",
+                    users=max(scale // 20, 10),
+                    cagnottes=max(scale // 1000, 2),
+                    propositions=max(scale // 50, 10),
+                    offres=scale,
+                    demandes=max(scale // 100, 1),
+                    seed=seed,
+                    stdout=self.stderr,
+                )
+                report[str(scale)] = run(repeat)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        content = json.dumps(report, indent=2, sort_keys=True)
+        if output:
+            with open(output, "w") as f:
+                f.write(content + "\n")
+        else:
+            self.stdout.write(content)
@@ -0,0 +1,18 @@
+"""Show the hit ratio of the cached fragments of templates."""
+from django.core.management.base import BaseCommand
+
+from ...caching import FRAGMENTS, fragment_stats
+
+
+class Command(BaseCommand):
+    """Show the hits, misses and hit ratio of each cached fragment."""
+
+    help = __doc__  # noqa: A003
+
+    def handle(self, *args, **options):
+        """Read the counters from the cache."""
+        for name, stats in fragment_stats(FRAGMENTS).items():
+            ratio = "-" if stats["ratio"] is None else f"{100 * stats['ratio']:.1f} %"
+            self.stdout.write(
+                f"{name}: {stats['hits']} hit(s), {stats['misses']} miss(es), {ratio}",
+            )
@@ -0,0 +1,39 @@
+"""Generate the missing derivatives of the images."""
+from django.core.management.base import BaseCommand
+
+from ...images import generate
+from ...models import Cagnotte, Proposition
+
+
+class Command(BaseCommand):
+    """Generate the resized derivatives of the images of Cagnottes and Propositions."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the pool and the batches."""
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="generate them again, even if they already exist",
+        )
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, force, workers, batch_size, **options):
+        """Process the images by batches, and mark them as done after each batch."""
+        for model in (Cagnotte, Proposition):
+            objects = model.objects.exclude(image="").order_by("pk")
+            if not force:
+                objects = objects.filter(image_derivees=False)
+            done = 0
+            # iterate by pk, as done objects leave the queryset
+            last = 0
+            while batch := list(objects.filter(pk__gt=last)[:batch_size]):
+                last = batch[-1].pk
+                images = generate((obj.image for obj in batch), workers=workers)
+                names = {image.name for image in images}
+                pks = [obj.pk for obj in batch if obj.image.name in names]
+                done += model.objects.filter(pk__in=pks).update(image_derivees=True)
+                model.images_modifiees(pks)
+            self.stdout.write(f"{done} image(s) de {model._meta.verbose_name} faite(s)")
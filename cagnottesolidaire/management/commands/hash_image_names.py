@@ -0,0 +1,70 @@
+"""Rename the images to include a hash of their content."""
+import logging
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...images import derivative_names
+from ...models import Cagnotte, Proposition
+
+logger = logging.getLogger(__name__)
+
+HASHED = re.compile(r"_[0-9a-f]{16}\.[^./]+$")
+
+
+class Command(BaseCommand):
+    """Rename the images of Cagnottes and Propositions, and their derivatives."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the batches."""
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, batch_size, **options):
+        """Rename the images of each model."""
+        for model in (Cagnotte, Proposition):
+            objects = model.objects.exclude(image="").order_by("pk")
+            if model is Proposition:
+                objects = objects.select_related("cagnotte")
+            renamed, last = 0, 0
+            while batch := list(objects.filter(pk__gt=last)[:batch_size]):
+                last = batch[-1].pk
+                renamed += self.rename(model, batch)
+            self.stdout.write(
+                f"{renamed} image(s) de {model._meta.verbose_name} renommée(s)",
+            )
+
+    def rename(self, model, batch: list) -> int:
+        """Copy the files, update the rows, and only then remove the old files."""
+        renamed, olds = [], []
+        for obj in batch:
+            image = obj.image
+            if HASHED.search(image.name):
+                continue
+            if not image.storage.exists(image.name):
+                logger.warning("%s is missing", image.name)
+                continue
+            old = image.name
+            new = image.field.generate_filename(obj, old)
+            image.close()
+            copies = [(old, new)]
+            if obj.image_derivees:
+                copies += zip(derivative_names(old), derivative_names(new), strict=True)
+            for source, destination in copies:
+                if image.storage.exists(source) and not image.storage.exists(
+                    destination,
+                ):
+                    with image.storage.open(source, "rb") as f:
+                        image.storage.save(destination, f)
+            image.name = new
+            renamed.append(obj)
+            olds += [source for source, _ in copies]
+        with transaction.atomic():
+            model.objects.bulk_update(renamed, ["image"])
+            model.images_modifiees([obj.pk for obj in renamed])
+        storage = model._meta.get_field("image").storage
+        for name in olds:
+            storage.delete(name)
+        return len(renamed)
@@ -0,0 +1,49 @@
+"""Load a running server with concurrent clients on the read-only views."""
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from ... import urls
+from ...benchmark import load, url_kwargs
+
+READ_VIEWS = ["cagnotte_list", "cagnotte", "proposition", "offre_list"]
+
+
+class Command(BaseCommand):
+    """Report the requests per second and the p99 latency of a running server.
+
+    Run it once against the WSGI server and once against the ASGI one, on the same
+    database, to compare them.
+    """
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the server and the load."""
+        parser.add_argument("server", help="eg. http://localhost:8000")
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, server, clients, requests, **options):
+        """Log in the benchmark user, and load its read-only views."""
+        client = Client()
+        user, _ = User.objects.get_or_create(username="benchmark", is_staff=True)
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        headers = {"Cookie": f"{settings.SESSION_COOKIE_NAME}={session}"}
+        kwargs = url_kwargs()
+        report = {
+            name: load(
+                server.rstrip("/")
+                + reverse(f"{urls.app_name}:{name}", kwargs=kwargs[name]),
+                clients,
+                requests,
+                headers,
+            )
+            for name in READ_VIEWS
+        }
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
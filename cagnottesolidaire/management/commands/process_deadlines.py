@@ -0,0 +1,42 @@
+"""Close the Cagnottes whose deadlines have passed."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...mails import enqueue_all
+from ...models import Cagnotte
+
+
+class Command(BaseCommand):
+    """Close the deposits and purchases of the Cagnottes past their deadlines.
+
+    Pending Offres of the Cagnottes closed expire, and their responsables get a
+    summary. Each deadline is processed once, so this may run from cron as often as
+    needed.
+    """
+
+    help = __doc__  # noqa: A003
+
+    def handle(self, *args, **options):
+        """Close the purchases first, so that a Cagnotte past both gets one mail."""
+        with transaction.atomic():
+            cloturees = Cagnotte.objects.cloturer()
+            enqueue_all(
+                "Votre cagnotte est terminée",
+                "cagnottesolidaire/mails/cloturee",
+                [
+                    (cagnotte.responsable, {"cagnotte": cagnotte})
+                    for cagnotte in cloturees
+                ],
+            )
+        with transaction.atomic():
+            closes = Cagnotte.objects.clore_depots()
+            enqueue_all(
+                "Le dépôt des propositions sur votre cagnotte est terminé",
+                "cagnottesolidaire/mails/depot_clos",
+                [(cagnotte.responsable, {"cagnotte": cagnotte}) for cagnotte in closes],
+            )
+        expirees = sum(cagnotte.offres_expirees for cagnotte in cloturees)
+        self.stdout.write(
+            f"{len(cloturees)} cagnotte(s) clôturée(s), "
+            f"{expirees} offre(s) expirée(s), {len(closes)} dépôt(s) clos",
+        )
@@ -0,0 +1,19 @@
+"""Rebuild the full-text search index."""
+from django.core.management.base import BaseCommand
+
+from ...search import rebuild
+
+
+class Command(BaseCommand):
+    """Index all the Cagnottes, Propositions and Demandes again."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the batches."""
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        """Rebuild the index by batches."""
+        count = rebuild(batch_size=batch_size)
+        self.stdout.write(f"{count} document(s) indexé(s)")
@@ -0,0 +1,22 @@
+"""Rebuild the stored totals of the Cagnottes."""
+from django.core.management.base import BaseCommand
+
+from ...models import Cagnotte
+
+
+class Command(BaseCommand):
+    """Rebuild the stored totals of the Cagnottes from their valid Offres."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Allow to restrict the rebuild to some Cagnottes."""
+        parser.add_argument("slugs", nargs="*", help="only rebuild those Cagnottes")
+
+    def handle(self, *args, slugs, **options):
+        """Rebuild all the totals with a single UPDATE."""
+        cagnottes = Cagnotte.objects.all()
+        if slugs:
+            cagnottes = cagnottes.filter(slug__in=slugs)
+        count = cagnottes.recompute_totals()
+        self.stdout.write(f"{count} cagnotte(s) mise(s) à jour")
@@ -0,0 +1,56 @@
+"""Mark the Offres of a Cagnotte as paid from a bank statement."""
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Cagnotte
+from ...reconciliation import apply, parse, reconcile
+
+
+class Command(BaseCommand):
+    """Match the lines of a bank CSV export with the unpaid Offres of a Cagnotte."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Get the Cagnotte, the bank statement, and if the matches must be applied."""
+        parser.add_argument("cagnotte", help="slug of the Cagnotte")
+        parser.add_argument("releve", help="path of the bank CSV export")
+        parser.add_argument("--encoding", default="utf-8-sig")
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="mark the matched Offres as paid, instead of a dry run",
+        )
+
+    def handle(self, *args, **options):
+        """Show the matches and the rejected lines, then apply the matches."""
+        try:
+            cagnotte = Cagnotte.objects.get(slug=options["cagnotte"])
+        except Cagnotte.DoesNotExist:
+            err = f"Pas de cagnotte {options['cagnotte']}"
+            raise CommandError(err) from None
+        with open(options["releve"], encoding=options["encoding"], newline="") as f:
+            try:
+                rapprochement = reconcile(cagnotte, parse(f))
+            except ValidationError as e:
+                raise CommandError(" ".join(e.messages)) from None
+        for ligne, offre in rapprochement.correspondances:
+            self.stdout.write(
+                f"+ ligne {ligne.numero}: offre {offre.pk} ({offre.prix} €) "
+                f"de {offre.beneficiaire_s} sur {offre.proposition}",
+            )
+        for ligne, rejet in rapprochement.rejets:
+            self.stdout.write(
+                f"- ligne {ligne.numero}: {ligne.libelle} ({ligne.montant} €): {rejet}",
+            )
+        if options["apply"]:
+            offres = apply(
+                cagnotte,
+                [offre.pk for _, offre in rapprochement.correspondances],
+            )
+            self.stdout.write(f"{len(offres)} offre(s) marquée(s) comme payée(s)")
+        else:
+            self.stdout.write(
+                f"{len(rapprochement.correspondances)} offre(s) à marquer comme "
+                f"payée(s), pour {rapprochement.total} €: relancer avec --apply",
+            )
@@ -0,0 +1,153 @@
+"""Create a synthetic dataset to benchmark the application."""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import Cagnotte, Demande, Offre, Proposition
+from ...search import rebuild
+
+
+class Command(BaseCommand):
+    """Bulk create deterministic Users, Cagnottes, Propositions, Offres and Demandes."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the size of the dataset."""
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--cagnottes", type=int, default=20)
+        parser.add_argument("--propositions", type=int, default=500)
+        parser.add_argument("--offres", type=int, default=10_000)
+        parser.add_argument("--demandes", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--prefix",
+            default="bench",
+            help="prefix of the usernames and names, which must be unique",
+        )
+
+    def handle(self, *args, **options):
+        """Create the dataset in a single transaction."""
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        with transaction.atomic():
+            users = self.users(prefix, options["users"])
+            cagnottes = self.cagnottes(prefix, options["cagnottes"], users)
+            propositions = self.propositions(
+                prefix,
+                options["propositions"],
+                cagnottes,
+                users,
+            )
+            self.offres(options["offres"], propositions, users)
+            self.demandes(options["demandes"], cagnottes, users)
+            Cagnotte.objects.filter(name__startswith=prefix).recompute_totals()
+            Proposition.objects.filter(name__startswith=prefix).recompute_restants()
+            # bulk_create sends no signals
+            rebuild(batch_size=self.batch_size)
+        self.stdout.write(
+            f"{len(users)} users, {len(cagnottes)} cagnottes, "
+            f"{len(propositions)} propositions, {options['offres']} offres "
+            f"and {options['demandes']} demandes created",
+        )
+
+    def create(self, model, objects: list, **lookup) -> list:
+        """Bulk create objects, and fetch them back with their primary keys."""
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return list(model.objects.filter(**lookup).order_by("pk"))
+
+    def users(self, prefix: str, count: int) -> list[User]:
+        """Create Users."""
+        users = [
+            User(
+                username=f"{prefix}{i}",
+                email=f"{prefix}{i}@example.org",
+                password="!",  # unusable
+            )
+            for i in range(count)
+        ]
+        return self.create(User, users, username__startswith=prefix)
+
+    def cagnottes(self, prefix: str, count: int, users: list[User]) -> list[Cagnotte]:
+        """Create Cagnottes, one half already closed."""
+        today = date.today()
+        cagnottes = []
+        for i in range(count):
+            fin_achat = today + timedelta(days=self.rng.randint(-365, 365))
+            cagnottes.append(
+                Cagnotte(
+                    name=f"{prefix} cagnotte {i}",
+                    responsable=self.rng.choice(users),
+                    objectif=f"objectif {i}",
+                    finances=self.rng.randint(100, 10_000),
+                    fin_depot=fin_achat - timedelta(days=30),
+                    fin_achat=fin_achat,
+                ),
+            )
+        return self.create(Cagnotte, cagnottes, name__startswith=prefix)
+
+    def propositions(
+        self,
+        prefix: str,
+        count: int,
+        cagnottes: list[Cagnotte],
+        users: list[User],
+    ) -> list[Proposition]:
+        """Create Propositions, some of them unlimited."""
+        propositions = []
+        for i in range(count):
+            beneficiaires = self.rng.choice([0, 1, 5, 20, 100])
+            propositions.append(
+                Proposition(
+                    name=f"{prefix} proposition {i}",
+                    cagnotte=self.rng.choice(cagnottes),
+                    responsable=self.rng.choice(users),
+                    description=f"description {i}",
+                    prix=self.rng.randint(1, 100),
+                    beneficiaires=beneficiaires,
+                    restants=beneficiaires or None,
+                ),
+            )
+        return self.create(Proposition, propositions, name__startswith=prefix)
+
+    def offres(self, count: int, propositions: list[Proposition], users: list[User]):
+        """Create Offres, validating them only when the Proposition has places left."""
+        restants = {p.pk: p.beneficiaires or None for p in propositions}
+        offres = []
+        for _ in range(count):
+            proposition = self.rng.choice(propositions)
+            valide = self.rng.choice([None, True, True, False])
+            if valide and restants[proposition.pk] is not None:
+                if restants[proposition.pk] == 0:
+                    valide = False
+                else:
+                    restants[proposition.pk] -= 1
+            offres.append(
+                Offre(
+                    proposition=proposition,
+                    beneficiaire=self.rng.choice(users),
+                    valide=valide,
+                    paye=bool(valide) and self.rng.random() < 0.5,
+                    prix=proposition.prix + Decimal(self.rng.randint(0, 10)),
+                    remarques=self.rng.choice(["", "", "merci !"]),
+                ),
+            )
+        Offre.objects.bulk_create(offres, batch_size=self.batch_size)
+
+    def demandes(self, count: int, cagnottes: list[Cagnotte], users: list[User]):
+        """Create Demandes."""
+        demandes = [
+            Demande(
+                cagnotte=self.rng.choice(cagnottes),
+                demandeur=self.rng.choice(users),
+                description=f"demande {i}",
+            )
+            for i in range(count)
+        ]
+        Demande.objects.bulk_create(demandes, batch_size=self.batch_size)
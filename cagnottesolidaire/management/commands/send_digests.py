@@ -0,0 +1,24 @@
+"""Put the digests of the new Offres in the outbox."""
+from django.core.management.base import BaseCommand
+
+from ...mails import send_digests
+from ...models import Preference
+
+
+class Command(BaseCommand):
+    """Put one digest of their new Offres in the outbox per user of this frequence.
+
+    Run it every hour with "horaire", and every day with "quotidienne": send_outbox
+    sends the digests.
+    """
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Choose the frequence of the digests."""
+        parser.add_argument("frequence", choices=["horaire", "quotidienne"])
+
+    def handle(self, *args, frequence, **options):
+        """Build the digests, with a single query for the Notifications."""
+        count = send_digests(Preference.Frequence[frequence.upper()])
+        self.stdout.write(f"{count} résumé(s) mis en file")
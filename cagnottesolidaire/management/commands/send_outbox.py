@@ -0,0 +1,39 @@
+"""Send the mails waiting in the outbox."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...mails import send_batch
+
+
+class Command(BaseCommand):
+    """Send the due mails of the outbox, in batches over a single SMTP connection."""
+
+    help = __doc__  # noqa: A003
+
+    def add_arguments(self, parser):
+        """Configure the batches, and the worker mode."""
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep running, waiting for new mails",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="seconds to wait when the outbox is empty, with --loop",
+        )
+
+    def handle(self, *args, batch_size, loop, interval, **options):
+        """Drain the outbox."""
+        total = 0
+        while True:
+            count = send_batch(batch_size)
+            total += count
+            if count < batch_size:
+                if not loop:
+                    break
+                time.sleep(interval)
+        self.stdout.write(f"{total} mail(s) traité(s)")
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:43
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def compute_totals(apps, schema_editor):
+    Cagnotte = apps.get_model('cagnottesolidaire', 'Cagnotte')
+    valides = Q(proposition__offre__valide=True)
+    payees = valides & Q(proposition__offre__paye=True)
+    for cagnotte in Cagnotte.objects.annotate(
+        promis=Sum('proposition__offre__prix', filter=valides),
+        encaisse=Sum('proposition__offre__prix', filter=payees),
+        nombre=Count('proposition__offre', filter=valides),
+    ):
+        cagnotte.total_promis = cagnotte.promis or 0
+        cagnotte.total_encaisse = cagnotte.encaisse or 0
+        cagnotte.nb_offres = cagnotte.nombre
+        cagnotte.save(update_fields=['total_promis', 'total_encaisse', 'nb_offres'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0002_upgrade_django'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cagnotte',
+            name='nb_offres',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre d`offres validées'),
+        ),
+        migrations.AddField(
+            model_name='cagnotte',
+            name='total_encaisse',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Total encaissé'),
+        ),
+        migrations.AddField(
+            model_name='cagnotte',
+            name='total_promis',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Total promis'),
+        ),
+        migrations.AlterField(
+            model_name='cagnotte',
+            name='objectif',
+            field=models.TextField(verbose_name='Description de l`objectif de la cagnotte'),
+        ),
+        migrations.RunPython(compute_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0003_cagnotte_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cagnotte',
+            index=models.Index(fields=['fin_achat', 'id'], name='cagnotte_fin_achat_idx'),
+        ),
+    ]
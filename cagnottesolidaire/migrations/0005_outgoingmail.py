@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0004_cagnotte_fin_achat_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingMail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('destinataire', models.EmailField(max_length=254)),
+                ('sujet', models.CharField(max_length=250)),
+                ('texte', models.TextField()),
+                ('html', models.TextField(blank=True)),
+                ('statut', models.PositiveSmallIntegerField(choices=[(0, 'en attente'), (1, 'envoyé'), (2, 'abandonné')], default=0)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now)),
+                ('erreur', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='outgoingmail',
+            index=models.Index(condition=models.Q(('statut', 0)), fields=['prochain_essai'], name='outgoingmail_en_attente_idx'),
+        ),
+    ]
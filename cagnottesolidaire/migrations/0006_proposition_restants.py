@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:48
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def compute_restants(apps, schema_editor):
+    Proposition = apps.get_model('cagnottesolidaire', 'Proposition')
+    propositions = Proposition.objects.exclude(beneficiaires=0).annotate(
+        valides=Count('offre', filter=Q(offre__valide=True)),
+    )
+    for proposition in propositions:
+        proposition.restants = max(proposition.beneficiaires - proposition.valides, 0)
+        proposition.save(update_fields=['restants'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0005_outgoingmail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposition',
+            name='restants',
+            field=models.PositiveIntegerField(editable=False, help_text='vide pour un nombre illimité', null=True, verbose_name='Places restantes'),
+        ),
+        migrations.RunPython(compute_restants, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='proposition',
+            index=models.Index(condition=models.Q(('restants__isnull', True), ('restants__gt', 0), _connector='OR'), fields=['cagnotte'], name='proposition_disponible_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cagnottesolidaire', '0006_proposition_restants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='proposition',
+            name='proposition_disponible_idx',
+        ),
+        migrations.AlterField(
+            model_name='offre',
+            name='beneficiaire',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='offre',
+            name='proposition',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='cagnottesolidaire.proposition'),
+        ),
+        migrations.AlterField(
+            model_name='proposition',
+            name='cagnotte',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='cagnottesolidaire.cagnotte'),
+        ),
+        migrations.AddIndex(
+            model_name='offre',
+            index=models.Index(fields=['proposition', 'valide'], name='offre_proposition_valide_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offre',
+            index=models.Index(condition=models.Q(('valide', True)), fields=['proposition', 'paye'], name='offre_valide_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offre',
+            index=models.Index(fields=['beneficiaire', 'proposition'], name='offre_beneficiaire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposition',
+            index=models.Index(fields=['cagnotte', 'prix'], name='proposition_cagnotte_prix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposition',
+            index=models.Index(condition=models.Q(('restants__isnull', True), ('restants__gt', 0), _connector='OR'), fields=['cagnotte', 'prix'], name='proposition_disponible_idx'),
+        ),
+    ]
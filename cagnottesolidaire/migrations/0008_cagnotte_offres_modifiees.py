@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cagnotte',
+            name='offres_modifiees',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Dernière modification d`une offre'),
+        ),
+    ]
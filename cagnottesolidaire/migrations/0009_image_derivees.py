@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0008_cagnotte_offres_modifiees'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cagnotte',
+            name='image_derivees',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons de l`image générées'),
+        ),
+        migrations.AddField(
+            model_name='proposition',
+            name='image_derivees',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Déclinaisons de l`image générées'),
+        ),
+    ]
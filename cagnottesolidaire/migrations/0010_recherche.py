@@ -0,0 +1,75 @@
+from django.db import migrations
+from django.db.models import Value
+
+TABLE = "cagnottesolidaire_recherche"
+# modele: (code, title field, text field), as in cagnottesolidaire.search
+MODELES = {
+    "cagnotte": (1, "name", "objectif"),
+    "proposition": (2, "name", "description"),
+    "demande": (3, None, "description"),
+}
+
+
+def create(apps, schema_editor):
+    """Create the shadow table of the search index, and index the historical objects."""
+    postgresql = schema_editor.connection.vendor == "postgresql"
+    if postgresql:
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} ("
+            "modele varchar(16) NOT NULL, objet bigint NOT NULL, "
+            "titre text NOT NULL, texte text NOT NULL, vecteur tsvector NOT NULL, "
+            "PRIMARY KEY (modele, objet))",
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {TABLE}_vecteur_idx ON {TABLE} USING GIN (vecteur)",
+        )
+    else:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            "modele UNINDEXED, objet UNINDEXED, titre, texte, "
+            "tokenize='unicode61 remove_diacritics 2')",
+        )
+
+    alias = schema_editor.connection.alias
+    for modele, (code, titre, texte) in MODELES.items():
+        model = apps.get_model('cagnottesolidaire', modele)
+        objects = model.objects.using(alias).order_by("pk")
+        if titre:
+            documents = objects.values_list("pk", titre, texte)
+        else:
+            documents = objects.annotate(titre=Value(""))
+            documents = documents.values_list("pk", "titre", texte)
+        with schema_editor.connection.cursor() as cursor:
+            if postgresql:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (modele, objet, titre, texte, vecteur) "
+                    "VALUES (%s, %s, %s, %s, "
+                    "setweight(to_tsvector('french', %s), 'A') || "
+                    "setweight(to_tsvector('french', %s), 'B'))",
+                    [(modele, o, ti, te, ti, te) for o, ti, te in documents.iterator()],
+                )
+            else:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (rowid, modele, objet, titre, texte) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    [
+                        (o * 4 + code, modele, o, ti, te)
+                        for o, ti, te in documents.iterator()
+                    ],
+                )
+
+
+def drop(apps, schema_editor):
+    """Drop the shadow table of the search index."""
+    schema_editor.execute(f"DROP TABLE {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0009_image_derivees'),
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
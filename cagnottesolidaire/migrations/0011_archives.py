@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:21
+
+import cagnottesolidaire.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cagnottesolidaire', '0010_recherche'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cagnotte',
+            name='archivee',
+            field=models.BooleanField(default=False, editable=False, help_text='ses propositions, offres et demandes sont dans les archives', verbose_name='Archivée'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedProposition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('prix', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('beneficiaires', models.IntegerField(verbose_name='Nombre maximal de bénéficiaires')),
+                ('image', models.ImageField(blank=True, upload_to=cagnottesolidaire.models.upload_to_prop, verbose_name='Image')),
+                ('image_derivees', models.BooleanField(default=False)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('offres_valides', models.PositiveIntegerField(verbose_name='Nombre d`offres validées')),
+                ('offres_somme', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Somme des offres validées')),
+                ('cagnotte', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='propositions_archivees', to='cagnottesolidaire.cagnotte')),
+                ('responsable', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('cagnotte', 'prix'),
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOffre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valide', models.BooleanField(null=True, verbose_name='validé')),
+                ('paye', models.BooleanField(verbose_name='payé')),
+                ('remarques', models.TextField(blank=True)),
+                ('prix', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('beneficiaire', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('proposition', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='offres', to='cagnottesolidaire.archivedproposition')),
+            ],
+            options={
+                'ordering': ('paye', 'valide', 'proposition'),
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedDemande',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=250)),
+                ('cagnotte', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='demandes_archivees', to='cagnottesolidaire.cagnotte')),
+                ('demandeur', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
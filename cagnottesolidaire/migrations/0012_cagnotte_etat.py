@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:37
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def backfill_etat(apps, schema_editor):
+    """Close the past deadlines silently, so that process_deadlines only mails new ones."""
+    Cagnotte = apps.get_model('cagnottesolidaire', 'Cagnotte')
+    Offre = apps.get_model('cagnottesolidaire', 'Offre')
+    today = date.today()
+    Cagnotte.objects.filter(fin_depot__lt=today).update(etat=1)
+    Cagnotte.objects.filter(fin_achat__lt=today).update(etat=2)
+    Offre.objects.filter(valide=None, proposition__cagnotte__etat=2).update(valide=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cagnottesolidaire', '0011_archives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cagnotte',
+            name='etat',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'ouverte'), (1, 'dépôt des propositions clos'), (2, 'clôturée')], default=0, editable=False, verbose_name='État'),
+        ),
+        migrations.RunPython(backfill_etat, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cagnotte',
+            index=models.Index(condition=models.Q(('etat', 0)), fields=['fin_depot'], name='cagnotte_depot_ouvert_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cagnotte',
+            index=models.Index(condition=models.Q(('etat__lt', 2)), fields=['fin_achat'], name='cagnotte_achat_ouvert_idx'),
+        ),
+    ]
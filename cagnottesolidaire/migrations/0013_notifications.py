@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cagnottesolidaire', '0012_cagnotte_etat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Preference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequence', models.PositiveSmallIntegerField(choices=[(0, 'à chaque offre'), (1, 'un résumé par heure'), (2, 'un résumé par jour')], default=0, verbose_name='Notification des nouvelles offres')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='preference', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creee', models.DateTimeField(default=django.utils.timezone.now)),
+                ('destinataire', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('offre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cagnottesolidaire.offre')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['destinataire', 'id'], name='notification_destinataire_idx'),
+        ),
+    ]
@@ -1,26 +1,35 @@
 """Main models."""
-from datetime import date
+from collections import Counter, defaultdict
+from datetime import date, datetime
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
 from django.db.models.query import QuerySet
 from django.urls import reverse
+from django.utils import timezone
 
 from ndh.models import Links, NamedModel, TimeStampedModel
+from ndh.querysets import NameOrderedQuerySet
 from ndh.utils import Numeric, query_sum
 
+from . import caching, images
+
 
 def upload_to_proj(instance: NamedModel, filename: str) -> str:
-    """Set upload path for Cagnotte images."""
-    return f"cagnottesolidaire/proj_{instance.slug}." + filename.split(".")[-1]
+    """Set upload path for Cagnotte images, with a hash of their content."""
+    digest = images.content_hash(instance.image)  # type: ignore
+    return f"cagnottesolidaire/proj_{instance.slug}_{digest}." + filename.split(".")[-1]
 
 
 def upload_to_prop(instance: NamedModel, filename: str) -> str:
-    """Set upload path for Proposition images."""
+    """Set upload path for Proposition images, with a hash of their content."""
     cagnotte: str = instance.cagnotte.slug  # type: ignore
+    digest = images.content_hash(instance.image)  # type: ignore
     return (
-        f"cagnottesolidaire/proj_{cagnotte}_prop_{instance.slug}."
+        f"cagnottesolidaire/proj_{cagnotte}_prop_{instance.slug}_{digest}."
         + filename.split(".")[-1]
     )
 
@@ -39,9 +48,256 @@ def validate_future(value: date):
         raise ValidationError(err)
 
 
-class Cagnotte(Links, TimeStampedModel, NamedModel):
+class ImageDerivativesMixin(models.Model):
+    """Generate the resized derivatives of a new image when saving."""
+
+    # lookup of the slug of the Cagnotte whose pages show the image
+    CAGNOTTE_SLUG = "slug"
+
+    image_derivees = models.BooleanField(
+        "Déclinaisons de l`image générées",
+        default=False,
+        editable=False,
+    )
+
+    class Meta:
+        """Meta definitions."""
+
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """Save, and then generate the derivatives of a new image.
+
+        A single image is resized in this process: a pool is only worth its start
+        for the batches of generate_image_derivatives.
+        """
+        nouvelle = images.is_new(self.image)
+        if nouvelle or not self.image:
+            self.image_derivees = False
+        super().save(*args, **kwargs)
+        if nouvelle:
+            self.image_derivees = bool(images.generate([self.image], workers=0))
+            type(self).objects.filter(pk=self.pk).update(
+                image_derivees=self.image_derivees,
+            )
+
+    @classmethod
+    def images_modifiees(cls, pks: list[int]):
+        """Mark these objects as updated, after a bulk change of their image files.
+
+        This moves the validators of their pages on, and changes the versions of
+        their Cagnottes and of the list, before the old files are removed.
+        """
+        objects = cls.objects.filter(pk__in=pks)
+        objects.update(updated=timezone.now())
+        if caching.versioned():
+            slugs = set(objects.values_list(cls.CAGNOTTE_SLUG, flat=True))
+            caching.bump(*slugs, caching.LIST)
+
+
+class CagnotteQuerySet(NameOrderedQuerySet):
+    """QuerySet for Cagnottes."""
+
+    def actives(self) -> QuerySet:
+        """Get the Cagnottes still open for purchases."""
+        return self.filter(fin_achat__gte=date.today())
+
+    def closes(self) -> QuerySet:
+        """Get the Cagnottes closed for purchases."""
+        return self.filter(fin_achat__lt=date.today())
+
+    def with_totals(self) -> QuerySet:
+        """Get what the detail pages need, the money totals being already stored."""
+        return self.select_related("responsable")
+
+    def validators(self) -> tuple[str | None, datetime | None]:
+        """Get an ETag and a Last-Modified date for the first of these Cagnottes.
+
+        They change with the Cagnotte, its Propositions and its Offres, and every day,
+        as the availability of the Propositions depends on the date.
+        This takes a single query, without any aggregate on the Offres.
+        """
+        stamps = (
+            self.order_by()
+            .annotate(propositions_modifiees=Max("proposition__updated"))
+            .values_list("pk", "updated", "offres_modifiees", "propositions_modifiees")
+            .first()
+        )
+        if stamps is None:
+            return None, None
+        pk, *dates = stamps
+        dates = [d for d in dates if d is not None]
+        parts = [str(pk), date.today().isoformat()]
+        parts += [str(int(d.timestamp() * 1_000_000)) for d in dates]
+        return "-".join(parts), max(dates)
+
+    def add_totals(self, promis: Numeric = 0, encaisse: Numeric = 0, nombre: int = 0):
+        """Add to the totals of these Cagnottes, and mark their Offres as modified."""
+        updates = {"offres_modifiees": timezone.now()}
+        if promis or encaisse or nombre:
+            updates.update(
+                total_promis=F("total_promis") + promis,
+                total_encaisse=F("total_encaisse") + encaisse,
+                nb_offres=F("nb_offres") + nombre,
+            )
+        caching.bump_cagnottes(self)
+        return self.update(**updates)
+
+    def recompute_totals(self) -> int:
+        """Rebuild the stored totals of these Cagnottes from their valid Offres.
+
+        The totals of the archived Cagnottes are frozen.
+        """
+        valides = (
+            Offre.objects.filter(proposition__cagnotte=OuterRef("pk"), valide=True)
+            .order_by()
+            .values("proposition__cagnotte")
+        )
+        payees = valides.filter(paye=True)
+        decimal = models.DecimalField(max_digits=10, decimal_places=2)
+        caching.bump_cagnottes(self)
+        return self.filter(archivee=False).update(
+            total_promis=Coalesce(
+                Subquery(valides.annotate(s=Sum("prix")).values("s")),
+                0,
+                output_field=decimal,
+            ),
+            total_encaisse=Coalesce(
+                Subquery(payees.annotate(s=Sum("prix")).values("s")),
+                0,
+                output_field=decimal,
+            ),
+            nb_offres=Coalesce(
+                Subquery(valides.annotate(n=Count("pk")).values("n")),
+                0,
+            ),
+        )
+
+    def archiver(self) -> int:
+        """Move the Propositions, Offres and Demandes of these Cagnottes to archives.
+
+        Rows are copied with an INSERT ... SELECT per table, in a single transaction,
+        and the Cagnottes keep their frozen totals.
+        """
+        with transaction.atomic():
+            pks = list(
+                self.filter(archivee=False)
+                .select_for_update()
+                .values_list("pk", flat=True),
+            )
+            propositions = Proposition.objects.filter(cagnotte__in=pks)
+            offres = Offre.objects.filter(proposition__cagnotte__in=pks)
+            demandes = Demande.objects.filter(cagnotte__in=pks)
+            valides = Q(offre__valide=True)
+            copy_rows(
+                propositions,
+                ArchivedProposition,
+                offres_valides=Count("offre", filter=valides),
+                offres_somme=Coalesce(
+                    Sum("offre__prix", filter=valides),
+                    0,
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+            )
+            copy_rows(offres, ArchivedOffre)
+            copy_rows(demandes, ArchivedDemande)
+            offres.delete()
+            propositions.delete()
+            demandes.delete()
+            caching.bump_cagnottes(self.filter(pk__in=pks))
+            return self.filter(pk__in=pks).update(
+                archivee=True,
+                offres_modifiees=timezone.now(),
+            )
+
+    def clore_depots(self) -> list["Cagnotte"]:
+        """Close the deposit of Propositions on these Cagnottes, past their fin_depot.
+
+        Return the Cagnottes closed by this call, with their responsable.
+        """
+        with transaction.atomic():
+            cagnottes = list(
+                self.filter(etat=Cagnotte.Etat.OUVERTE, fin_depot__lt=date.today())
+                .select_related("responsable")
+                .select_for_update(of=("self",))
+                .order_by("pk"),
+            )
+            self.model.objects.filter(pk__in=[c.pk for c in cagnottes]).update(
+                etat=Cagnotte.Etat.DEPOT_CLOS,
+            )
+            caching.bump(*[cagnotte.slug for cagnotte in cagnottes])
+        for cagnotte in cagnottes:
+            cagnotte.etat = Cagnotte.Etat.DEPOT_CLOS
+        return cagnottes
+
+    def cloturer(self) -> list["Cagnotte"]:
+        """Close these Cagnottes past their fin_achat, and expire their pending Offres.
+
+        The pending Offres are refused with a single UPDATE, as they don't count in the
+        totals nor in the places. Return the Cagnottes closed by this call, with their
+        responsable, and their number of offres_expirees.
+        """
+        with transaction.atomic():
+            cagnottes = list(
+                self.exclude(etat=Cagnotte.Etat.CLOTUREE)
+                .filter(fin_achat__lt=date.today())
+                .select_related("responsable")
+                .select_for_update(of=("self",))
+                .order_by("pk"),
+            )
+            pks = [cagnotte.pk for cagnotte in cagnottes]
+            attente = Offre.objects.filter(valide=None, proposition__cagnotte__in=pks)
+            expirees = dict(
+                attente.order_by()
+                .values("proposition__cagnotte")
+                .annotate(n=Count("pk"))
+                .values_list("proposition__cagnotte", "n"),
+            )
+            attente.update(valide=False)
+            self.model.objects.filter(pk__in=pks).update(
+                etat=Cagnotte.Etat.CLOTUREE,
+                offres_modifiees=timezone.now(),
+            )
+            caching.bump(*[cagnotte.slug for cagnotte in cagnottes])
+        for cagnotte in cagnottes:
+            cagnotte.etat = Cagnotte.Etat.CLOTUREE
+            cagnotte.offres_expirees = expirees.get(cagnotte.pk, 0)
+        return cagnottes
+
+
+def copy_rows(queryset: QuerySet, model: type[models.Model], **expressions) -> int:
+    """Copy the rows of a queryset into a model with a single INSERT ... SELECT.
+
+    Fields of the model are read from the same columns, or from the expressions given.
+    """
+    fields = list(model._meta.concrete_fields)
+    annotations = {
+        f"copy_{field.attname}": expressions.get(field.attname, F(field.attname))
+        for field in fields
+    }
+    select = queryset.order_by().annotate(**annotations).values_list(*annotations)
+    sql, params = select.query.sql_with_params()
+    connection = connections[router.db_for_write(model)]
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} "
+            f"({columns}) {sql}",
+            params,
+        )
+        return cursor.rowcount
+
+
+class Cagnotte(ImageDerivativesMixin, Links, TimeStampedModel, NamedModel):
     """Model for a Cagnotte."""
 
+    class Etat(models.IntegerChoices):
+        """States of a Cagnotte, after its deadlines, set by process_deadlines."""
+
+        OUVERTE = 0, "ouverte"
+        DEPOT_CLOS = 1, "dépôt des propositions clos"
+        CLOTUREE = 2, "clôturée"
+
     responsable = models.ForeignKey(User, on_delete=models.PROTECT)
     image = models.ImageField("Image", upload_to=upload_to_proj, blank=True)
     objectif = models.TextField("Description de l`objectif de la cagnotte")
@@ -56,37 +312,140 @@ class Cagnotte(Links, TimeStampedModel, NamedModel):
         validators=[validate_future],
     )
     fin_achat = models.DateField("Date de fin des achats", validators=[validate_future])
+    total_promis = models.DecimalField(
+        "Total promis",
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+    total_encaisse = models.DecimalField(
+        "Total encaissé",
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+    nb_offres = models.PositiveIntegerField(
+        "Nombre d`offres validées",
+        default=0,
+        editable=False,
+    )
+    offres_modifiees = models.DateTimeField(
+        "Dernière modification d`une offre",
+        null=True,
+        editable=False,
+    )
+    archivee = models.BooleanField(
+        "Archivée",
+        default=False,
+        editable=False,
+        help_text="ses propositions, offres et demandes sont dans les archives",
+    )
+    etat = models.PositiveSmallIntegerField(
+        "État",
+        choices=Etat.choices,
+        default=Etat.OUVERTE,
+        editable=False,
+    )
+
+    objects = CagnotteQuerySet.as_manager()
+
+    class Meta:
+        """Meta definitions."""
+
+        indexes = (
+            models.Index(fields=("fin_achat", "id"), name="cagnotte_fin_achat_idx"),
+            # only the Cagnottes whose deadlines are still to process
+            models.Index(
+                fields=("fin_depot",),
+                condition=Q(etat=0),
+                name="cagnotte_depot_ouvert_idx",
+            ),
+            models.Index(
+                fields=("fin_achat",),
+                condition=Q(etat__lt=2),
+                name="cagnotte_achat_ouvert_idx",
+            ),
+        )
 
     def offres(self) -> QuerySet:
         """Get valid Offres for this Cagnotte."""
         return Offre.objects.filter(proposition__cagnotte=self, valide=True)
 
     def somme(self) -> Numeric:
-        """Get the sum of the prices for the valid Offres of this Cagnotte."""
-        return query_sum(self.offres(), "prix", output_field=models.DecimalField())
+        """Get the stored sum of the prices for the valid Offres of this Cagnotte."""
+        return self.total_promis
 
     def somme_encaissee(self) -> Numeric:
-        """Get the sum of the prices for the valid and payed Offres of this Cagnotte."""
-        return query_sum(
-            self.offres().filter(paye=True),
-            "prix",
-            output_field=models.DecimalField(),
-        )
+        """Get the stored sum of the prices for the valid and payed Offres."""
+        return self.total_encaisse
 
     def progress(self) -> int:
         """Get the advancement in percent of the goal for this Cagnotte."""
         return int(round(100 * self.somme() / self.finances))
 
+    def depot_ouvert(self) -> bool:
+        """Tell if Propositions may still be added, even before process_deadlines."""
+        return self.etat == self.Etat.OUVERTE and date.today() <= self.fin_depot
+
+    def achat_ouvert(self) -> bool:
+        """Tell if Offres may still be made, even before process_deadlines."""
+        return self.etat != self.Etat.CLOTUREE and date.today() <= self.fin_achat
+
     @property
     def responsable_s(self) -> str:
         """Get the name of the responsable of this Cagnotte as a string."""
         return self.responsable.get_short_name() or self.responsable.get_username()
 
 
-class Proposition(Links, TimeStampedModel, NamedModel):
+DISPONIBLE = Q(restants__isnull=True) | Q(restants__gt=0)
+
+
+class PropositionQuerySet(NameOrderedQuerySet):
+    """QuerySet for Propositions."""
+
+    def recompute_restants(self) -> int:
+        """Rebuild the stored remaining places of these Propositions."""
+        valides = (
+            Offre.objects.filter(proposition=OuterRef("pk"), valide=True)
+            .order_by()
+            .values("proposition")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        caching.bump_cagnottes(Cagnotte.objects.filter(pk__in=self.values("cagnotte")))
+        limitees = self.exclude(beneficiaires=0).update(
+            restants=Greatest(F("beneficiaires") - Coalesce(Subquery(valides), 0), 0),
+        )
+        return limitees + self.filter(beneficiaires=0).update(restants=None)
+
+    def disponibles(self) -> QuerySet:
+        """Get the Propositions with places left, on open Cagnottes."""
+        return self.filter(DISPONIBLE, cagnotte__fin_achat__gte=date.today())
+
+    def with_offer_stats(self) -> QuerySet:
+        """Annotate the numbers of [all, valid, payed] Offres, and the valid sum."""
+        valides = Q(offre__valide=True)
+        return self.annotate(
+            offres_total=Count("offre"),
+            offres_valides=Count("offre", filter=valides),
+            offres_payees=Count("offre", filter=Q(offre__paye=True)),
+            offres_somme=Coalesce(
+                Sum("offre__prix", filter=valides),
+                0,
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+
+class Proposition(ImageDerivativesMixin, Links, TimeStampedModel, NamedModel):
     """Model for a Proposition on a Cagnotte."""
 
-    cagnotte = models.ForeignKey(Cagnotte, on_delete=models.PROTECT)
+    CAGNOTTE_SLUG = "cagnotte__slug"
+
+    # indexed by proposition_cagnotte_prix_idx
+    cagnotte = models.ForeignKey(Cagnotte, on_delete=models.PROTECT, db_index=False)
     responsable = models.ForeignKey(User, on_delete=models.PROTECT)
     description = models.TextField()
     prix = models.DecimalField(
@@ -100,12 +459,31 @@ class Proposition(Links, TimeStampedModel, NamedModel):
         validators=[validate_positive],
         help_text="0 pour un nombre illimité",
     )
+    restants = models.PositiveIntegerField(
+        "Places restantes",
+        null=True,
+        editable=False,
+        help_text="vide pour un nombre illimité",
+    )
     image = models.ImageField("Image", upload_to=upload_to_prop, blank=True)
 
+    objects = PropositionQuerySet.as_manager()
+
     class Meta:
         """Meta definitions."""
 
         ordering = ("cagnotte", "prix")
+        indexes = (
+            models.Index(
+                fields=("cagnotte", "prix"),
+                name="proposition_cagnotte_prix_idx",
+            ),
+            models.Index(
+                fields=("cagnotte", "prix"),
+                condition=DISPONIBLE,
+                name="proposition_disponible_idx",
+            ),
+        )
 
     def get_absolute_url(self) -> str:
         """Get the url of this Proposition."""
@@ -115,21 +493,61 @@ class Proposition(Links, TimeStampedModel, NamedModel):
         )
 
     def offres(self) -> list[int]:
-        """Get a list of number of [all, valid, payed] Offres for this Proposition."""
+        """Get a list of number of [all, valid, payed] Offres for this Proposition.
+
+        Use the annotations of PropositionQuerySet.with_offer_stats when available.
+        """
+        if hasattr(self, "offres_total"):
+            return [self.offres_total, self.offres_valides, self.offres_payees]
         filters: list[dict[str, int]] = [{}, {"valide": True}, {"paye": True}]
         return [self.offre_set.filter(**f).count() for f in filters]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Load a Proposition, and remember its number of beneficiaires."""
+        instance = super().from_db(db, field_names, values)
+        instance._beneficiaires = instance.__dict__.get("beneficiaires")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Save this Proposition, without writing back its remaining places.
+
+        They are taken and given back by the conditional UPDATEs of the Offres, and
+        only recomputed in SQL when the number of beneficiaires changes, while the
+        UPDATE of this Proposition holds its lock.
+        """
+        if self._state.adding:
+            self.restants = self.beneficiaires or None
+            super().save(*args, **kwargs)
+            self._beneficiaires = self.beneficiaires
+            return
+        fields = kwargs.get("update_fields")
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred
+            ]
+        kwargs["update_fields"] = [field for field in fields if field != "restants"]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if "beneficiaires" in kwargs["update_fields"] and self.beneficiaires != (
+                getattr(self, "_beneficiaires", None)
+            ):
+                propositions = Proposition.objects.filter(pk=self.pk)
+                propositions.recompute_restants()
+                self.restants = propositions.values_list("restants", flat=True).get()
+                self._beneficiaires = self.beneficiaires
+
     def offrable(self) -> bool:
         """Tell if this Proposition is available."""
-        if date.today() > self.cagnotte.fin_achat:
-            return False
-        return (
-            self.beneficiaires == 0
-            or self.offre_set.filter(valide=True).count() < self.beneficiaires
-        )
+        return self.cagnotte.achat_ouvert() and self.restants != 0
 
     def somme(self) -> Numeric:
         """Get the sum of all Offres for this Proposition."""
+        if hasattr(self, "offres_somme"):
+            return self.offres_somme
         return query_sum(
             self.offre_set.filter(valide=True),
             "prix",
@@ -147,11 +565,128 @@ class Proposition(Links, TimeStampedModel, NamedModel):
         return self.responsable.get_short_name() or self.responsable.get_username()
 
 
+class OffreQuerySet(QuerySet):
+    """QuerySet for Offres, with bulk state transitions.
+
+    Each transition locks the Offres it may change, updates them in a single UPDATE,
+    and then the places of their Propositions and the totals of their Cagnottes,
+    with one UPDATE each. They return the pks of the Offres changed.
+    """
+
+    def locked(self, *args, **kwargs) -> list[dict]:
+        """Lock the Offres allowed for a transition, and get what it may change."""
+        return list(
+            self.filter(*args, **kwargs)
+            .select_for_update()
+            .order_by("pk")
+            .values(
+                "pk",
+                "proposition",
+                "prix",
+                "paye",
+                "valide",
+                cagnotte=F("proposition__cagnotte"),
+            ),
+        )
+
+    def accepter(self) -> list[int]:
+        """Accept the pending or refused Offres, while their Propositions have places.
+
+        The Offres are accepted in pk order: first come, first served.
+        """
+        with transaction.atomic():
+            offres = self.locked(~Q(valide=True))
+            restants = dict(
+                Proposition.objects.select_for_update()
+                .filter(pk__in={offre["proposition"] for offre in offres})
+                .values_list("pk", "restants"),
+            )
+            acceptees, places = [], Counter()
+            for offre in offres:
+                restant = restants[offre["proposition"]]
+                if restant is None or places[offre["proposition"]] < restant:
+                    acceptees.append(offre)
+                    places[offre["proposition"]] += 1
+            pks = [offre["pk"] for offre in acceptees]
+            self.model.objects.filter(pk__in=pks).update(valide=True)
+            for proposition, nombre in places.items():
+                if restants[proposition] is not None:
+                    Proposition.objects.filter(pk=proposition).update(
+                        restants=F("restants") - nombre,
+                    )
+            self._add_totals(acceptees, sign=1)
+        return pks
+
+    def refuser(self) -> list[int]:
+        """Refuse the pending or accepted Offres, and give back the places taken."""
+        with transaction.atomic():
+            offres = self.locked(~Q(valide=False))
+            pks = [offre["pk"] for offre in offres]
+            self.model.objects.filter(pk__in=pks).update(valide=False)
+            self._retirer(offres)
+        return pks
+
+    def supprimer(self) -> list[int]:
+        """Delete the Offres, and give back the places taken by the accepted ones."""
+        with transaction.atomic():
+            offres = self.locked()
+            pks = [offre["pk"] for offre in offres]
+            self._retirer(offres)
+            self.model.objects.filter(pk__in=pks).delete()
+        return pks
+
+    def encaisser(self) -> list[int]:
+        """Mark the accepted Offres as payed."""
+        with transaction.atomic():
+            offres = self.locked(valide=True, paye=False)
+            pks = [offre["pk"] for offre in offres]
+            self.model.objects.filter(pk__in=pks).update(paye=True)
+            encaisse: dict[int, Numeric] = defaultdict(int)
+            for offre in offres:
+                encaisse[offre["cagnotte"]] += offre["prix"]
+            for cagnotte, total in encaisse.items():
+                Cagnotte.objects.filter(pk=cagnotte).add_totals(encaisse=total)
+        return pks
+
+    @classmethod
+    def _retirer(cls, offres: list[dict]):
+        """Give back the places and totals of the accepted locked Offres."""
+        acceptees = [offre for offre in offres if offre["valide"]]
+        places = Counter(offre["proposition"] for offre in acceptees)
+        for proposition, nombre in places.items():
+            Proposition.objects.filter(
+                pk=proposition,
+                restants__isnull=False,
+            ).update(restants=F("restants") + nombre)
+        cls._add_totals(acceptees, sign=-1)
+        cls._add_totals([offre for offre in offres if not offre["valide"]], sign=0)
+
+    @staticmethod
+    def _add_totals(offres: list[dict], sign: int):
+        """Add (or remove, with sign=-1) locked Offres to the totals of their Cagnotte.
+
+        With sign=0, only mark the Offres of their Cagnottes as modified.
+        """
+        totals: dict[int, list] = defaultdict(lambda: [0, 0, 0])
+        for offre in offres:
+            total = totals[offre["cagnotte"]]
+            total[0] += sign * offre["prix"]
+            total[1] += sign * offre["prix"] if offre["paye"] else 0
+            total[2] += sign
+        for cagnotte, total in totals.items():
+            Cagnotte.objects.filter(pk=cagnotte).add_totals(*total)
+
+
 class Offre(Links, models.Model):
     """Model for an Offre on a Proposition."""
 
-    proposition = models.ForeignKey(Proposition, on_delete=models.PROTECT)
-    beneficiaire = models.ForeignKey(User, on_delete=models.PROTECT)
+    # indexed by offre_proposition_valide_idx and offre_beneficiaire_idx
+    proposition = models.ForeignKey(
+        Proposition,
+        on_delete=models.PROTECT,
+        db_index=False,
+    )
+    beneficiaire = models.ForeignKey(User, on_delete=models.PROTECT, db_index=False)
     valide = models.BooleanField("validé", default=None, null=True)
     paye = models.BooleanField("payé", default=False)
     remarques = models.TextField(blank=True)
@@ -161,10 +696,27 @@ class Offre(Links, models.Model):
         validators=[validate_positive],
     )
 
+    objects = OffreQuerySet.as_manager()
+
     class Meta:
         """Meta definitions."""
 
         ordering = ("paye", "valide", "proposition")
+        indexes = (
+            models.Index(
+                fields=("proposition", "valide"),
+                name="offre_proposition_valide_idx",
+            ),
+            models.Index(
+                fields=("proposition", "paye"),
+                condition=Q(valide=True),
+                name="offre_valide_idx",
+            ),
+            models.Index(
+                fields=("beneficiaire", "proposition"),
+                name="offre_beneficiaire_idx",
+            ),
+        )
 
     def __str__(self) -> str:
         """Format this Offre as a string."""
@@ -177,6 +729,71 @@ class Offre(Links, models.Model):
         """Get the url of the Proposition of this Offre."""
         return self.proposition.get_absolute_url()
 
+    def save(self, *args, **kwargs):
+        """Save this Offre, and keep the totals of its Cagnotte in sync."""
+        with transaction.atomic():
+            old = None
+            if self.pk is not None:
+                old = (
+                    Offre.objects.select_for_update()
+                    .select_related("proposition")
+                    .filter(pk=self.pk)
+                    .first()
+                )
+            if old is None or (old.valide, old.proposition_id) != (
+                self.valide,
+                self.proposition_id,
+            ):
+                if old is not None:
+                    old.update_places(1)
+                self.update_places(-1)
+            super().save(*args, **kwargs)
+            self.update_totals(old=old)
+
+    def delete(self, *args, **kwargs):
+        """Delete this Offre, and remove it from its Proposition and Cagnotte."""
+        with transaction.atomic():
+            self.update_places(1)
+            self.update_totals(-1)
+            return super().delete(*args, **kwargs)
+
+    def update_places(self, sign: int):
+        """Give back (sign=1) or take (sign=-1) a place on the Proposition, if valid.
+
+        A place is taken with a single conditional UPDATE, so that concurrent
+        validations can not oversell a Proposition.
+        """
+        if not self.valide:
+            return
+        propositions = Proposition.objects.filter(pk=self.proposition_id)
+        if sign < 0:
+            propositions = propositions.exclude(restants=0)
+        if not propositions.update(restants=F("restants") + sign) and sign < 0:
+            err = "Il n`y a plus de place sur cette proposition"
+            raise ValidationError(err)
+
+    def contribution(self) -> tuple[Numeric, Numeric, int]:
+        """Get what this Offre adds to the [promis, encaissé, nombre] totals."""
+        if not self.valide:
+            return 0, 0, 0
+        return self.prix, self.prix if self.paye else 0, 1
+
+    def update_totals(self, sign: int = 1, old: "Offre | None" = None):
+        """Add (or remove, with sign=-1) this Offre to the totals of its Cagnotte.
+
+        When the old version of this Offre is given, apply only the difference.
+        In any case, mark the Offres of the Cagnotte as modified.
+        """
+        cagnotte = self.proposition.cagnotte_id
+        deltas = [sign * value for value in self.contribution()]
+        if old is not None:
+            if old.proposition.cagnotte_id == cagnotte:
+                olds = old.contribution()
+                deltas = [d - o for d, o in zip(deltas, olds, strict=True)]
+            else:
+                old.update_totals(-1)
+        Cagnotte.objects.filter(pk=cagnotte).add_totals(*deltas)
+
     @property
     def responsable_s(self) -> str:
         """Get the name of the responsable of the Proposition as a string."""
@@ -202,3 +819,186 @@ class Demande(models.Model):
     def get_absolute_url(self) -> str:
         """Return the url of the Cagnotte for this Demande."""
         return self.cagnotte.get_absolute_url()
+
+    def save(self, *args, **kwargs):
+        """Save this Demande, and mark the pages of its Cagnotte as modified."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Cagnotte.objects.filter(pk=self.cagnotte_id).add_totals()
+
+    def delete(self, *args, **kwargs):
+        """Delete this Demande, and mark the pages of its Cagnotte as modified."""
+        with transaction.atomic():
+            Cagnotte.objects.filter(pk=self.cagnotte_id).add_totals()
+            return super().delete(*args, **kwargs)
+
+
+class ArchivedProposition(models.Model):
+    """Model for a Proposition of an archived Cagnotte, with its frozen Offres stats."""
+
+    cagnotte = models.ForeignKey(
+        Cagnotte,
+        on_delete=models.PROTECT,
+        related_name="propositions_archivees",
+    )
+    responsable = models.ForeignKey(User, on_delete=models.PROTECT, related_name="+")
+    name = models.CharField(max_length=200)
+    slug = models.CharField(max_length=200)
+    description = models.TextField()
+    prix = models.DecimalField(max_digits=8, decimal_places=2)
+    beneficiaires = models.IntegerField("Nombre maximal de bénéficiaires")
+    image = models.ImageField("Image", upload_to=upload_to_prop, blank=True)
+    image_derivees = models.BooleanField(default=False)
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+    offres_valides = models.PositiveIntegerField("Nombre d`offres validées")
+    offres_somme = models.DecimalField(
+        "Somme des offres validées",
+        max_digits=10,
+        decimal_places=2,
+    )
+
+    class Meta:
+        """Meta definitions."""
+
+        ordering = ("cagnotte", "prix")
+
+    def __str__(self) -> str:
+        """Return the name of this ArchivedProposition."""
+        return self.name
+
+    @property
+    def ben_s(self) -> str:
+        """Get the number of beneficiaires for this Proposition as a string."""
+        return str(self.beneficiaires or "∞")
+
+
+class ArchivedOffre(models.Model):
+    """Model for an Offre on an archived Proposition."""
+
+    proposition = models.ForeignKey(
+        ArchivedProposition,
+        on_delete=models.PROTECT,
+        related_name="offres",
+    )
+    beneficiaire = models.ForeignKey(User, on_delete=models.PROTECT, related_name="+")
+    valide = models.BooleanField("validé", null=True)
+    paye = models.BooleanField("payé")
+    remarques = models.TextField(blank=True)
+    prix = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        """Meta definitions."""
+
+        ordering = ("paye", "valide", "proposition")
+
+    def __str__(self) -> str:
+        """Format this ArchivedOffre as a string."""
+        return f"offre archivée {self.pk}"
+
+
+class ArchivedDemande(models.Model):
+    """Model for a Demande on an archived Cagnotte."""
+
+    cagnotte = models.ForeignKey(
+        Cagnotte,
+        on_delete=models.PROTECT,
+        related_name="demandes_archivees",
+    )
+    demandeur = models.ForeignKey(User, on_delete=models.PROTECT, related_name="+")
+    description = models.CharField(max_length=250)
+
+    def __str__(self) -> str:
+        """Return the description of this ArchivedDemande."""
+        return self.description
+
+
+class OutgoingMail(TimeStampedModel):
+    """Model for a mail waiting in the outbox, sent later by the send_outbox worker."""
+
+    class Statut(models.IntegerChoices):
+        """States of a mail in the outbox."""
+
+        EN_ATTENTE = 0, "en attente"
+        ENVOYE = 1, "envoyé"
+        ABANDONNE = 2, "abandonné"
+
+    destinataire = models.EmailField()
+    sujet = models.CharField(max_length=250)
+    texte = models.TextField()
+    html = models.TextField(blank=True)
+    statut = models.PositiveSmallIntegerField(
+        choices=Statut.choices,
+        default=Statut.EN_ATTENTE,
+    )
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    erreur = models.TextField(blank=True)
+
+    class Meta:
+        """Meta definitions."""
+
+        indexes = (
+            models.Index(
+                fields=("prochain_essai",),
+                condition=Q(statut=0),
+                name="outgoingmail_en_attente_idx",
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Format this OutgoingMail as a string."""
+        return f"{self.sujet} → {self.destinataire} ({self.get_statut_display()})"
+
+
+class Preference(models.Model):
+    """Model for the notification preferences of a User."""
+
+    class Frequence(models.IntegerChoices):
+        """How often a User is told about the new Offres on their Propositions."""
+
+        IMMEDIATE = 0, "à chaque offre"
+        HORAIRE = 1, "un résumé par heure"
+        QUOTIDIENNE = 2, "un résumé par jour"
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="preference",
+    )
+    frequence = models.PositiveSmallIntegerField(
+        "Notification des nouvelles offres",
+        choices=Frequence.choices,
+        default=Frequence.IMMEDIATE,
+    )
+
+    def __str__(self) -> str:
+        """Format this Preference as a string."""
+        return f"{self.user}: {self.get_frequence_display()}"
+
+    def get_absolute_url(self) -> str:
+        """Get the url of the preferences."""
+        return reverse("cagnottesolidaire:preferences")
+
+
+class Notification(models.Model):
+    """Model for a new Offre waiting for the next digest of its destinataire."""
+
+    # indexed by notification_destinataire_idx
+    destinataire = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    offre = models.ForeignKey(Offre, on_delete=models.CASCADE)
+    creee = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Meta definitions."""
+
+        indexes = (
+            models.Index(
+                fields=("destinataire", "id"),
+                name="notification_destinataire_idx",
+            ),
+        )
+
+    def __str__(self) -> str:
+        """Format this Notification as a string."""
+        return f"{self.offre} → {self.destinataire}"
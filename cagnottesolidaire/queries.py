@@ -0,0 +1,111 @@
+"""Query budgets for the views of the Cagnotte Solidaire django application."""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+
+def get_budget(view_name: str | None) -> int | None:
+    """Get the maximal number of queries allowed for a view, if any.
+
+    Budgets are read from the CAGNOTTESOLIDAIRE_QUERY_BUDGETS setting, a dict
+    of resolved view names, eg. "cagnottesolidaire:cagnotte", to numbers of queries,
+    with CAGNOTTESOLIDAIRE_QUERY_BUDGET as default.
+    """
+    budgets = getattr(settings, "CAGNOTTESOLIDAIRE_QUERY_BUDGETS", {})
+    default = getattr(settings, "CAGNOTTESOLIDAIRE_QUERY_BUDGET", None)
+    return budgets.get(view_name, default)
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the SQL and the time of each query."""
+
+    def __init__(self):
+        """Start with no queries."""
+        self.queries: list[tuple[str, float]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Record a query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __len__(self) -> int:
+        """Get the number of queries."""
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        """Get the total time spent in the database, in seconds."""
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self) -> dict[str, int]:
+        """Get the SQL run more than once, with different parameters or not."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.most_common() if count > 1}
+
+    def report(self, view_name: str | None, budget: int | None) -> str:
+        """Describe the queries of a view exceeding its budget."""
+        lines = [f"{view_name}: {len(self)} queries for a budget of {budget}"]
+        lines += [f"  {count} x {sql}" for sql, count in self.duplicates().items()]
+        return "\n".join(lines)
+
+
+@contextmanager
+def recording(recorder: QueryRecorder):
+    """Record the queries on every database, eg. the primary and its replicas."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class QueryBudgetMiddleware:
+    """Record the queries of each request, and log the GET exceeding their budget."""
+
+    def __init__(self, get_response):
+        """Keep the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Process the request under a QueryRecorder."""
+        recorder = QueryRecorder()
+        with recording(recorder):
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        budget = get_budget(view_name)
+        logger.debug(
+            "%s: %d queries in %.1f ms",
+            view_name,
+            len(recorder),
+            1000 * recorder.duration,
+        )
+        if request.method == "GET" and budget is not None and len(recorder) > budget:
+            logger.warning(recorder.report(view_name, budget))
+        return response
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin to check a view does not exceed its query budget."""
+
+    def assertQueryBudget(self, url: str, method: str = "get", **kwargs):  # noqa: N802
+        """Request an url, and fail with its duplicated SQL if it exceeds its budget."""
+        view_name = resolve(url.split("?")[0]).view_name
+        budget = get_budget(view_name)
+        if budget is None:
+            self.fail(f"{view_name} has no query budget")
+        recorder = QueryRecorder()
+        with recording(recorder):
+            response = getattr(self.client, method)(url, **kwargs)
+        if len(recorder) > budget:
+            self.fail(recorder.report(view_name, budget))
+        return response
@@ -0,0 +1,174 @@
+"""Reconcile bank statements with the Offres of a Cagnotte."""
+import csv
+import re
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Cagnotte, Offre
+
+# as asked in the acceptance mail: «Offre {{ offre.pk }}»
+REFERENCE = re.compile(r"offre\W*(?:n[°o]?\W*)?(\d+)", re.IGNORECASE)
+LIBELLES = ("libellé", "libelle", "label", "description", "motif")
+MONTANTS = ("montant", "crédit", "credit", "amount")
+
+
+@dataclass
+class Ligne:
+    """A credit line of a bank statement."""
+
+    numero: int
+    libelle: str
+    montant: Decimal
+
+    @property
+    def reference(self) -> int | None:
+        """Get the number of the Offre given in the label, if any."""
+        match = REFERENCE.search(self.libelle)
+        return int(match.group(1)) if match else None
+
+
+@dataclass
+class Rapprochement:
+    """Lines of a bank statement matched with Offres, or rejected with a reason."""
+
+    correspondances: list[tuple[Ligne, Offre]] = field(default_factory=list)
+    rejets: list[tuple[Ligne, str]] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        """Get the sum of the matched Offres."""
+        return sum((offre.prix for _, offre in self.correspondances), Decimal())
+
+
+def column(header: list[str], names: tuple[str, ...]) -> int:
+    """Find the index of a column of a bank statement from its possible names."""
+    for i, title in enumerate(header):
+        if title.strip().lower() in names:
+            return i
+    err = f"Le relevé n`a pas de colonne «{names[0]}»"
+    raise ValidationError(err)
+
+
+def amount(value: str) -> Decimal:
+    """Read an amount, eg. "1 234,56", "1.234,56", "1,234.56" or "1234.56".
+
+    The last of "," and "." separates the decimals, and the other one the thousands.
+    Raise InvalidOperation when that is ambiguous, eg. for "1,234".
+    """
+    value = value.replace("\xa0", "").replace(" ", "").replace("€", "")
+    separateurs = [sep for sep in ",." if sep in value]
+    if len(separateurs) == 1 and value.count(separateurs[0]) > 1:
+        # only thousands, eg. "1.234.567"
+        entier, decimales, milliers = value, "", separateurs[0]
+    elif separateurs:
+        virgule = max(separateurs, key=value.rfind)
+        entier, decimales = value.rsplit(virgule, 1)
+        milliers = "," if virgule == "." else "."
+        if len(separateurs) == 1 and len(decimales) == 3:
+            raise InvalidOperation(value)
+    else:
+        entier, decimales, milliers = value, "", ","
+    groupes = entier.split(milliers)
+    if any(len(groupe) != 3 for groupe in groupes[1:]):
+        raise InvalidOperation(value)
+    return Decimal("".join(groupes) + (f".{decimales}" if decimales else ""))
+
+
+def parse(lines: Iterable[str]) -> Iterator[Ligne]:
+    """Read the credit lines of a bank CSV export, one at a time.
+
+    The delimiter is guessed from the header, and debit lines are skipped.
+    """
+    lines = iter(lines)
+    first = next(lines, "")
+    delimiter = ";" if first.count(";") > first.count(",") else ","
+    reader = csv.reader(chain([first], lines), delimiter=delimiter)
+    header = next(reader, [])
+    libelle, montant = column(header, LIBELLES), column(header, MONTANTS)
+    for row in reader:
+        if not any(row):
+            continue
+        try:
+            value = amount(row[montant])
+        except (IndexError, InvalidOperation):
+            err = f"Ligne {reader.line_num}: montant invalide"
+            raise ValidationError(err) from None
+        if value > 0:
+            yield Ligne(reader.line_num, row[libelle], value)
+
+
+def reconcile(cagnotte: Cagnotte, lignes: Iterable[Ligne]) -> Rapprochement:
+    """Match lines with the valid and unpaid Offres of a Cagnotte.
+
+    A line matches the Offre given in its reference if the amounts are the same.
+    Without reference, it matches the only remaining Offre of this amount.
+    The index of the Offres is built with a single query.
+    """
+    offres = {
+        offre.pk: offre
+        for offre in Offre.objects.filter(
+            proposition__cagnotte=cagnotte,
+            valide=True,
+            paye=False,
+        ).select_related("beneficiaire", "proposition")
+    }
+    par_montant = defaultdict(set)
+    for offre in offres.values():
+        par_montant[offre.prix].add(offre.pk)
+    rapprochement = Rapprochement()
+
+    def match(ligne: Ligne, offre: Offre):
+        rapprochement.correspondances.append((ligne, offre))
+        del offres[offre.pk]
+        par_montant[offre.prix].discard(offre.pk)
+
+    sans_reference = []
+    for ligne in lignes:
+        reference = ligne.reference
+        if reference is None:
+            sans_reference.append(ligne)
+        elif reference not in offres:
+            rejet = f"pas d`offre {reference} validée et non payée sur cette cagnotte"
+            rapprochement.rejets.append((ligne, rejet))
+        elif offres[reference].prix != ligne.montant:
+            rejet = f"l`offre {reference} est de {offres[reference].prix} €"
+            rapprochement.rejets.append((ligne, rejet))
+        else:
+            match(ligne, offres[reference])
+
+    # only after the references, so that they can not be taken by an amount
+    for ligne in sans_reference:
+        candidats = par_montant[ligne.montant]
+        if len(candidats) == 1:
+            match(ligne, offres[next(iter(candidats))])
+        else:
+            rejet = "plusieurs offres de ce montant" if candidats else "pas d`offre"
+            rapprochement.rejets.append((ligne, f"sans référence, et {rejet}"))
+    return rapprochement
+
+
+def apply(cagnotte: Cagnotte, pks: Iterable[int]) -> list[Offre]:
+    """Mark these valid and unpaid Offres of a Cagnotte as paid, in one transaction."""
+    with transaction.atomic():
+        offres = list(
+            Offre.objects.select_for_update().filter(
+                proposition__cagnotte=cagnotte,
+                valide=True,
+                paye=False,
+                pk__in=list(pks),
+            ),
+        )
+        for offre in offres:
+            offre.paye = True
+        Offre.objects.bulk_update(offres, ["paye"])
+        if offres:
+            Cagnotte.objects.filter(pk=cagnotte.pk).add_totals(
+                encaisse=sum(offre.prix for offre in offres),
+            )
+    return offres
@@ -0,0 +1,84 @@
+"""Database router for read replicas of the Cagnotte Solidaire django application."""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# aliases of the read replicas in DATABASES
+REPLICAS = getattr(settings, "CAGNOTTESOLIDAIRE_REPLICAS", [])
+# how long a client reads from the primary after a write, in seconds
+PIN_SECONDS = getattr(settings, "CAGNOTTESOLIDAIRE_REPLICA_PIN_SECONDS", 10)
+PIN_COOKIE = "cagnottesolidaire_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# only the requests allowed by ReplicaMiddleware read from the replicas
+use_replicas: ContextVar[bool] = ContextVar("use_replicas", default=False)
+
+
+def use_primary(view):
+    """Mark a view which writes on GET, so that it only uses the primary."""
+    view.use_primary = True
+    return view
+
+
+class ReplicaRouter:
+    """Send the reads of safe requests to the replicas, and the rest to the primary."""
+
+    def db_for_read(self, model, **hints):
+        """Read from a random replica, if this request allows it."""
+        if REPLICAS and use_replicas.get():
+            return random.choice(REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary."""
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Relate objects of the primary and its replicas."""
+        databases = {"default", *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Leave the replicas follow the migrations of the primary."""
+        if db in REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Allow the replicas for safe requests, unless their client has just written.
+
+    After an unsafe request, or a view marked with use_primary, the client gets a
+    cookie pinning it to the primary for PIN_SECONDS, so that it reads its writes.
+    """
+
+    def __init__(self, get_response):
+        """Keep the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Reset the choice after each request, and pin the clients who wrote."""
+        token = use_replicas.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        if request.method not in SAFE_METHODS or getattr(request, "wrote", False):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Choose the databases for this view."""
+        if getattr(view_func, "use_primary", False):
+            request.wrote = True
+        elif request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES:
+            use_replicas.set(True)
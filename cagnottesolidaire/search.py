@@ -0,0 +1,184 @@
+"""Full-text search over the Cagnottes, Propositions and Demandes.
+
+Documents are kept in a shadow table, synced by signals: on PostgreSQL, a tsvector
+with the french configuration and a GIN index; elsewhere, an SQLite FTS5 table.
+The table is created by the 0010_recherche migration.
+"""
+import re
+
+from django.apps import apps
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cagnotte, Demande, Proposition
+
+TABLE = "cagnottesolidaire_recherche"
+PAGE = 20
+# modele: (code, title field, text field)
+MODELES = {
+    "cagnotte": (1, "name", "objectif"),
+    "proposition": (2, "name", "description"),
+    "demande": (3, None, "description"),
+}
+WORD = re.compile(r"\w+")
+
+
+def rowid(modele: str, objet: int) -> int:
+    """Get the SQLite rowid of a document."""
+    return objet * 4 + MODELES[modele][0]
+
+
+def document(modele: str, obj) -> tuple[str, int, str, str]:
+    """Get the (modele, objet, titre, texte) document of an object."""
+    _, titre, texte = MODELES[modele]
+    return (
+        modele,
+        obj.pk,
+        getattr(obj, titre) if titre else "",
+        getattr(obj, texte),
+    )
+
+
+def index(documents: list[tuple[str, int, str, str]], using: str = "default"):
+    """Add or replace documents in the search index."""
+    if not documents:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (modele, objet, titre, texte, vecteur) "
+                "VALUES (%s, %s, %s, %s, "
+                "setweight(to_tsvector('french', %s), 'A') || "
+                "setweight(to_tsvector('french', %s), 'B')) "
+                "ON CONFLICT (modele, objet) DO UPDATE SET titre = EXCLUDED.titre, "
+                "texte = EXCLUDED.texte, vecteur = EXCLUDED.vecteur",
+                [(m, o, ti, te, ti, te) for m, o, ti, te in documents],
+            )
+        else:
+            cursor.executemany(
+                f"DELETE FROM {TABLE} WHERE rowid = %s",
+                [(rowid(m, o),) for m, o, _, _ in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, modele, objet, titre, texte) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(rowid(m, o), m, o, ti, te) for m, o, ti, te in documents],
+            )
+
+
+def unindex(modele: str, objet: int, using: str = "default"):
+    """Remove a document from the search index."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE modele = %s AND objet = %s",
+                [modele, objet],
+            )
+        else:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid = %s",
+                [rowid(modele, objet)],
+            )
+
+
+def prune(modele: str, using: str = "default") -> int:
+    """Remove the documents of the objects of a modele which do not exist anymore."""
+    connection = connections[using]
+    model = apps.get_model("cagnottesolidaire", modele)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE modele = %s AND objet NOT IN "
+            f"(SELECT {connection.ops.quote_name(model._meta.pk.column)} "
+            f"FROM {connection.ops.quote_name(model._meta.db_table)})",
+            [modele],
+        )
+        return cursor.rowcount
+
+
+def rebuild(using: str = "default", batch_size: int = 1000) -> int:
+    """Index all the Cagnottes, Propositions and Demandes again, by batches.
+
+    The documents of the objects deleted or archived meanwhile are removed.
+    """
+    count = 0
+    for modele, (_, titre, texte) in MODELES.items():
+        model = apps.get_model("cagnottesolidaire", modele)
+        objects = model.objects.using(using).order_by("pk")
+        batch = []
+        for obj in objects.only(*filter(None, ["pk", titre, texte])).iterator():
+            batch.append(document(modele, obj))
+            if len(batch) == batch_size:
+                index(batch, using=using)
+                count += len(batch)
+                batch = []
+        index(batch, using=using)
+        count += len(batch)
+        prune(modele, using=using)
+    return count
+
+
+def query(q: str, limit: int, offset: int) -> list[tuple[str, int]]:
+    """Get the (modele, objet) matching a query, the most relevant first."""
+    connection = connections[router.db_for_read(Cagnotte)]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                f"SELECT modele, objet FROM {TABLE}, "
+                "websearch_to_tsquery('french', %s) query WHERE vecteur @@ query "
+                "ORDER BY ts_rank(vecteur, query) DESC, modele, objet "
+                "LIMIT %s OFFSET %s",
+                [q, limit, offset],
+            )
+        else:
+            words = WORD.findall(q)
+            if not words:
+                return []
+            # every word, as a prefix
+            match = " ".join(f'"{word}"*' for word in words)
+            cursor.execute(
+                f"SELECT modele, objet FROM {TABLE} WHERE {TABLE} MATCH %s "
+                f"ORDER BY bm25({TABLE}, 0, 0, 10.0, 1.0), rowid "
+                "LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+        return [(modele, int(objet)) for modele, objet in cursor.fetchall()]
+
+
+def search(q: str, page: int = 1) -> tuple[list, bool]:
+    """Get a page of the objects matching a query, and if there is a next one.
+
+    Objects are fetched with one query per modele found in this page.
+    """
+    found = query(q, PAGE + 1, (page - 1) * PAGE)
+    found, has_next = found[:PAGE], len(found) > PAGE
+    querysets = {
+        "cagnotte": Cagnotte.objects.all(),
+        "proposition": Proposition.objects.select_related("cagnotte"),
+        "demande": Demande.objects.select_related("cagnotte"),
+    }
+    objects = {}
+    for modele, queryset in querysets.items():
+        pks = [objet for m, objet in found if m == modele]
+        if pks:
+            objects.update({(modele, o.pk): o for o in queryset.filter(pk__in=pks)})
+    return [(m, objects[m, o]) for m, o in found if (m, o) in objects], has_next
+
+
+@receiver(post_save, sender=Cagnotte, dispatch_uid="recherche_cagnotte")
+@receiver(post_save, sender=Proposition, dispatch_uid="recherche_proposition")
+@receiver(post_save, sender=Demande, dispatch_uid="recherche_demande")
+def index_object(sender, instance, using: str, raw: bool = False, **kwargs):
+    """Index a Cagnotte, Proposition or Demande when it is saved."""
+    if not raw:
+        index([document(sender._meta.model_name, instance)], using=using)
+
+
+@receiver(post_delete, sender=Cagnotte, dispatch_uid="recherche_cagnotte_del")
+@receiver(post_delete, sender=Proposition, dispatch_uid="recherche_proposition_del")
+@receiver(post_delete, sender=Demande, dispatch_uid="recherche_demande_del")
+def unindex_object(sender, instance, using: str, **kwargs):
+    """Remove a Cagnotte, Proposition or Demande from the index when it is deleted."""
+    unindex(sender._meta.model_name, instance.pk, using=using)
@@ -0,0 +1,49 @@
+// Load the partials of the pages, from their data-partiel URL:
+// placeholders when the page is loaded, <details> when they are first opened,
+// and links, as "Voir plus" or "Voir", in place of themselves when they are clicked.
+(function () {
+  "use strict";
+
+  function charger(url, placer) {
+    fetch(url, {credentials: "same-origin"})
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status + " " + response.statusText);
+        }
+        return response.text();
+      })
+      .then(placer)
+      .catch(function (error) {
+        console.error("partiel " + url + ": " + error);
+      });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    document.querySelectorAll("[data-partiel]").forEach(function (element) {
+      if (element.tagName === "DETAILS") {
+        element.addEventListener("toggle", function () {
+          if (element.open && !element.dataset.charge) {
+            element.dataset.charge = "1";
+            charger(element.dataset.partiel, function (html) {
+              element.querySelector(".partiel").innerHTML = html;
+            });
+          }
+        });
+      } else if (element.tagName !== "A") {
+        charger(element.dataset.partiel, function (html) {
+          element.outerHTML = html;
+        });
+      }
+    });
+  });
+
+  document.addEventListener("click", function (event) {
+    var lien = event.target.closest("a[data-partiel]");
+    if (lien) {
+      event.preventDefault();
+      charger(lien.dataset.partiel, function (html) {
+        lien.outerHTML = html;
+      });
+    }
+  });
+})();
@@ -0,0 +1 @@
+"""Template tags for the Cagnotte Solidaire django application."""
@@ -0,0 +1,97 @@
+"""Template tags for the Cagnotte Solidaire django application."""
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from .. import caching
+from ..images import srcset, url
+
+register = template.Library()
+
+# variant: (derivatives in the srcset, sizes attribute)
+VARIANTS = {
+    "card": (("card", "detail"), "(min-width: 768px) 350px, 100vw"),
+    "detail": (("detail", "retina"), "(min-width: 768px) 66vw, 100vw"),
+}
+
+
+@register.simple_tag
+def picture(obj, variant: str = "card", css_class: str = "") -> str:
+    """Show the image of a Cagnotte or a Proposition, lazily, at the right size.
+
+    Browsers get WebP derivatives if they can, JPEG ones otherwise, and the original
+    if the derivatives are not generated yet.
+    """
+    alt = f"image pour {obj}"
+    if not obj.image:
+        return format_html(
+            '<img alt="{}" src="{}" class="{}" loading="lazy" />',
+            alt,
+            static("img/blank.png"),
+            css_class,
+        )
+    if not obj.image_derivees:
+        return format_html(
+            '<img alt="{}" src="{}" class="{}" loading="lazy" />',
+            alt,
+            obj.image.url,
+            css_class,
+        )
+    derivatives, sizes = VARIANTS[variant]
+    return format_html(
+        "<picture>"
+        '<source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img alt="{}" src="{}" srcset="{}" sizes="{}" class="{}" '
+        'loading="lazy" decoding="async" />'
+        "</picture>",
+        srcset(obj.image, derivatives, "webp"),
+        sizes,
+        alt,
+        url(obj.image, derivatives[0], "jpg"),
+        srcset(obj.image, derivatives, "jpg"),
+        sizes,
+        css_class,
+    )
+
+
+class FragmentNode(template.Node):
+    """Node of a fragment, cached until its Cagnotte changes."""
+
+    def __init__(self, nodelist, name, cagnotte, vary):
+        """Keep the content, the name, the Cagnotte and the values it depends on."""
+        self.nodelist = nodelist
+        self.name = name
+        self.cagnotte = cagnotte
+        self.vary = vary
+
+    def render(self, context) -> str:
+        """Get the fragment from the cache, or render it."""
+        if not caching.fragments_enabled():
+            return self.nodelist.render(context)
+        return caching.fragment(
+            self.name.resolve(context),
+            self.cagnotte.resolve(context).slug,
+            [value.resolve(context) for value in self.vary],
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag
+def fragment(parser, token) -> FragmentNode:
+    """Cache a fragment until its Cagnotte changes, if CAGNOTTESOLIDAIRE_FRAGMENT_CACHE.
+
+    Usage: {% fragment "name" cagnotte vary... %}...{% endfragment %}, where the
+    fragment also depends on the values of vary.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        err = f"{bits[0]} needs a name and a Cagnotte"
+        raise template.TemplateSyntaxError(err)
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -6,8 +6,30 @@ from . import views
 app_name = "cagnottesolidaire"
 urlpatterns = [
     path("", views.CagnotteListView.as_view(), name="cagnotte_list"),
+    path("archives", views.CagnotteArchiveView.as_view(), name="cagnotte_archives"),
+    path("recherche", views.recherche, name="recherche"),
     path("cagnotte", views.CagnotteCreateView.as_view(), name="cagnotte_create"),
     path("cagnotte/<str:slug>", views.CagnotteDetailView.as_view(), name="cagnotte"),
+    path(
+        "cagnotte/<str:slug>/progres",
+        views.cagnotte_progres,
+        name="cagnotte_progres",
+    ),
+    path(
+        "cagnotte/<str:slug>/propositions",
+        views.cagnotte_propositions,
+        name="cagnotte_propositions",
+    ),
+    path(
+        "cagnotte/<str:slug>/demandes",
+        views.cagnotte_demandes,
+        name="cagnotte_demandes",
+    ),
+    path(
+        "cagnotte/<str:slug>/tresorerie",
+        views.cagnotte_tresorerie,
+        name="cagnotte_tresorerie",
+    ),
     path(
         "cagnotte/<str:slug>/proposition",
         views.PropositionCreateView.as_view(),
@@ -23,12 +45,44 @@ urlpatterns = [
         views.OffreCreateView.as_view(),
         name="offre_create",
     ),
+    path(
+        "cagnotte/<str:p_slug>/proposition/<str:slug>/offres",
+        views.offres_proposition,
+        name="offres_proposition",
+    ),
+    path("cagnotte/<str:slug>/offres/paye", views.offres_paye, name="offres_paye"),
+    path(
+        "cagnotte/<str:slug>/rapprochement",
+        views.rapprochement,
+        name="rapprochement",
+    ),
+    path(
+        "cagnotte/<str:slug>/offres.csv",
+        views.offre_export,
+        name="offre_export",
+    ),
     path("offres", views.OffreListView.as_view(), name="offre_list"),
     path("offre/<int:pk>", views.OffreDetailView.as_view(), name="offre"),
     path("offre/<int:pk>/ok", views.offre_ok, name="offre_ok"),
     path("offre/<int:pk>/ko", views.offre_ko, name="offre_ko"),
     path("offre/<int:pk>/paye", views.offre_paye, name="offre_paye"),
+    path(
+        "offre/<int:pk>/remarques",
+        views.offre_remarques,
+        name="offre_remarques",
+    ),
     path("propositions", views.PropositionListView.as_view(), name="proposition_list"),
+    path(
+        "preferences",
+        views.PreferenceUpdateView.as_view(),
+        name="preferences",
+    ),
+    path("api/cagnotte/<str:slug>", views.cagnotte_api, name="cagnotte_api"),
+    path(
+        "api/cagnotte/<str:p_slug>/proposition/<str:slug>",
+        views.proposition_api,
+        name="proposition_api",
+    ),
     path(
         "demande/<str:slug>",
         views.DemandeCreateView.as_view(),
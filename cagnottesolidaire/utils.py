@@ -1,5 +1,15 @@
 """Utilities for the Cagnotte Solidaire django application."""
+from functools import update_wrapper
+
+from django.conf import settings
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from asgiref.sync import sync_to_async
 
 
 class IsUserOrAboveMixin(UserPassesTestMixin):
@@ -12,3 +22,125 @@ class IsUserOrAboveMixin(UserPassesTestMixin):
         if self.request.user.is_staff:
             return True
         return self.get_user() == self.request.user
+
+
+def keyset(queryset: QuerySet, field: str, cursor, descending=False) -> QuerySet:
+    """Order a queryset on (field, pk), and start after the cursor, if any."""
+    sign = "-" if descending else ""
+    queryset = queryset.order_by(f"{sign}{field}", f"{sign}pk")
+    if not cursor:
+        return queryset
+    model_field = queryset.model._meta.get_field(field)
+    try:
+        value, pk = cursor.rsplit("_", maxsplit=1)
+        value, pk = model_field.to_python(value), int(pk)
+    except (ValueError, ValidationError) as e:
+        raise Http404 from e
+    lookup = "lt" if descending else "gt"
+    return queryset.filter(
+        Q(**{f"{field}__{lookup}": value}) | Q(**{field: value, f"pk__{lookup}": pk}),
+    )
+
+
+class KeysetPage:
+    """A page of a queryset ordered by keyset, fetched when first used.
+
+    One more object than needed is fetched, to know if there is a next page.
+    """
+
+    def __init__(self, queryset: QuerySet, field: str, size: int):
+        """Keep the ordered queryset, its keyset field and the size of the page."""
+        self.queryset = queryset
+        self.field = field
+        self.size = size
+
+    @cached_property
+    def fetched(self) -> list:
+        """Fetch the objects of this page, and the first one of the next."""
+        return list(self.queryset[: self.size + 1])
+
+    @property
+    def object_list(self) -> list:
+        """Get the objects of this page."""
+        return self.fetched[: self.size]
+
+    @property
+    def next_cursor(self) -> str | None:
+        """Get the cursor of the next page, if there is one."""
+        if len(self.fetched) <= self.size:
+            return None
+        last = self.object_list[-1]
+        return f"{getattr(last, self.field)}_{last.pk}"
+
+
+class KeysetPaginationMixin:
+    """Mixin to paginate a ListView on (keyset_field, pk), without OFFSET nor COUNT.
+
+    The next page starts after the cursor given in the `cursor_kwarg` GET parameter,
+    so that page N costs the same as page 1.
+    """
+
+    keyset_field = "pk"
+    keyset_descending = False
+    keyset_size = 24
+    cursor_kwarg = "apres"
+
+    def get_queryset(self) -> QuerySet:
+        """Order on the keyset, and start after the cursor."""
+        return keyset(
+            super().get_queryset(),
+            self.keyset_field,
+            self.request.GET.get(self.cursor_kwarg),
+            self.keyset_descending,
+        )
+
+    def get_context_data(self, **kwargs) -> dict:
+        """Fetch one more object than needed to know if there is a next page."""
+        page = KeysetPage(self.object_list, self.keyset_field, self.keyset_size)
+        return super().get_context_data(
+            object_list=page.object_list,
+            cursor_kwarg=self.cursor_kwarg,
+            next_cursor=page.next_cursor,
+            first_page=self.cursor_kwarg not in self.request.GET,
+            **kwargs,
+        )
+
+
+class AsyncViewMixin:
+    """Mixin to serve a read-only View as a coroutine, for ASGI deployments.
+
+    Under ASGI, Django runs all the sync views of a process in a single thread, so one
+    slow query blocks every request. These views run their queries and their template in
+    the thread pool instead, each thread with its own database connection.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Get the async view with CAGNOTTESOLIDAIRE_ASYNC_VIEWS, or the sync one."""
+        if getattr(settings, "CAGNOTTESOLIDAIRE_ASYNC_VIEWS", False):
+            return cls.as_async_view(**initkwargs)
+        return super().as_view(**initkwargs)
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        """Get a coroutine function running the sync view in the thread pool."""
+        view = super().as_view(**initkwargs)
+
+        def respond(request, *args, **kwargs):
+            close_old_connections()
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+                return response
+            finally:
+                close_old_connections()
+
+        async def async_view(request, *args, **kwargs):
+            return await sync_to_async(respond, thread_sensitive=False)(
+                request,
+                *args,
+                **kwargs,
+            )
+
+        return update_wrapper(async_view, view)
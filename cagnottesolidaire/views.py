@@ -1,28 +1,146 @@
 """Main views."""
+import csv
+import io
 from datetime import date
+from functools import wraps
+from itertools import chain
 from typing import Any
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import PermissionDenied
-from django.core.mail import mail_admins
-from django.db.models import QuerySet
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect
-from django.template.loader import get_template
-from django.views.generic import CreateView, DeleteView, DetailView, ListView
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q, QuerySet
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_POST
+from django.views.generic import (
+    CreateView,
+    DeleteView,
+    DetailView,
+    ListView,
+    UpdateView,
+)
+
+from .caching import anonymous_page
+from .forms import CagnotteForm, OffreForm, ReleveForm
+from .mails import enqueue, enqueue_all, notify_offre
+from .models import ArchivedOffre, Cagnotte, Demande, Offre, Preference, Proposition
+from .reconciliation import apply, parse, reconcile
+from .routers import use_primary
+from .search import search
+from .utils import (
+    AsyncViewMixin,
+    IsUserOrAboveMixin,
+    KeysetPage,
+    KeysetPaginationMixin,
+    keyset,
+)
+
+EXPORT_CHUNK_SIZE = getattr(settings, "CAGNOTTESOLIDAIRE_EXPORT_CHUNK_SIZE", 2000)
+# how long anonymous visitors and proxies may use a page without revalidating it
+PAGE_MAX_AGE = getattr(settings, "CAGNOTTESOLIDAIRE_PAGE_MAX_AGE", 0)
+# sizes of the pages of the partials, the propositions by rows of 3
+PROPOSITIONS_PAGE = getattr(settings, "CAGNOTTESOLIDAIRE_PROPOSITIONS_PAGE", 24)
+TRESORERIE_PAGE = getattr(settings, "CAGNOTTESOLIDAIRE_TRESORERIE_PAGE", 100)
+
+
+def validators(request: HttpRequest, slug: str, p_slug: str | None = None):
+    """Get the ETag and Last-Modified of a Cagnotte, or of a Proposition in it.
+
+    They are computed once per request, and shared by the etag and last_modified
+    functions of the condition decorator.
+    """
+    if not hasattr(request, "cagnottesolidaire_validators"):
+        if p_slug is None:
+            cagnottes = Cagnotte.objects.filter(slug=slug)
+        else:
+            cagnottes = Cagnotte.objects.filter(slug=p_slug, proposition__slug=slug)
+        request.cagnottesolidaire_validators = cagnottes.validators()
+    return request.cagnottesolidaire_validators
+
+
+def cache_validators(view):
+    """Answer conditional GETs with a 304 before running the view."""
+    return condition(
+        etag_func=lambda request, **kwargs: validators(request, **kwargs)[0],
+        last_modified_func=lambda request, **kwargs: validators(request, **kwargs)[1],
+    )(view)
+
+
+def public_page(view):
+    """Let anonymous visitors and proxies revalidate a page with conditional GETs.
+
+    Pages of logged-in users depend on them, and are neither shared nor validated.
+    """
+    conditional = cache_validators(view)
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.user.is_authenticated:
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+        else:
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=PAGE_MAX_AGE,
+                must_revalidate=True,
+            )
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    return wrapper
+
+
+@method_decorator(anonymous_page, name="dispatch")
+class CagnotteListView(AsyncViewMixin, KeysetPaginationMixin, ListView):
+    """A view to list the Cagnottes still open, the ones ending first at the top."""
 
-from .forms import CagnotteForm, OffreForm
-from .models import Cagnotte, Demande, Offre, Proposition
-from .utils import IsUserOrAboveMixin
+    model = Cagnotte
+    context_object_name = "cagnotte_list"
+    keyset_field = "fin_achat"
+    archives = False
+    title = "Cagnottes en cours"
+
+    def get_queryset(self) -> QuerySet:
+        """Get only the open Cagnottes, or only the closed ones for the archives."""
+        queryset = super().get_queryset()
+        return queryset.closes() if self.archives else queryset.actives()
 
+    def get_context_data(self, **kwargs) -> dict:
+        """Add the title to the context."""
+        return super().get_context_data(
+            title=self.title,
+            archives=self.archives,
+            **kwargs,
+        )
 
-class CagnotteListView(ListView):
-    """A view to list all Cagnottes."""
 
-    model = Cagnotte
+class CagnotteArchiveView(CagnotteListView):
+    """A view to list the closed Cagnottes, the last ones at the top."""
+
+    keyset_descending = True
+    archives = True
+    title = "Cagnottes terminées"
+
+
+def recherche(request: HttpRequest) -> HttpResponse:
+    """Search the Cagnottes, Propositions and Demandes, the most relevant first."""
+    q = request.GET.get("q", "").strip()
+    page = request.GET.get("page", "1")
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+    results, has_next = search(q, page) if q else ([], False)
+    return render(
+        request,
+        "cagnottesolidaire/recherche.html",
+        {"q": q, "page": page, "results": results, "has_next": has_next},
+    )
 
 
 class CagnotteCreateView(LoginRequiredMixin, CreateView):
@@ -38,14 +156,40 @@ class CagnotteCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class CagnotteDetailView(DetailView):
+@method_decorator(anonymous_page, name="dispatch")
+@method_decorator(public_page, name="dispatch")
+class CagnotteDetailView(AsyncViewMixin, DetailView):
     """View a Cagnotte details."""
 
-    model = Cagnotte
+    object: Cagnotte  # noqa: A003
+    queryset = Cagnotte.objects.with_totals()
+
+    def get_template_names(self) -> list[str]:
+        """Show the archived Cagnottes read-only."""
+        if self.object.archivee:
+            return ["cagnottesolidaire/cagnotte_archive.html"]
+        return super().get_template_names()
 
     def get_context_data(self, **kwargs) -> dict:
-        """Add today's date to the context."""
-        return super().get_context_data(today=date.today(), **kwargs)
+        """Add the first page of the Propositions to the context.
+
+        The Demandes and the treasurer table are loaded later, from their partials.
+        Archived Cagnottes get everything from the archives.
+        """
+        if self.object.archivee:
+            return super().get_context_data(
+                propositions=self.object.propositions_archivees.all(),
+                demandes=self.object.demandes_archivees.all(),
+                offres=ArchivedOffre.objects.filter(
+                    proposition__cagnotte=self.object,
+                    valide=True,
+                ).select_related("beneficiaire"),
+                **kwargs,
+            )
+        return super().get_context_data(
+            **propositions_page(self.request, self.object),
+            **kwargs,
+        )
 
 
 class PropositionCreateView(LoginRequiredMixin, CreateView):
@@ -57,27 +201,129 @@ class PropositionCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form) -> HttpResponse:
         """Validate the Proposition creation form."""
         cagnotte = get_object_or_404(Cagnotte, slug=self.kwargs.get("slug", None))
+        if not cagnotte.depot_ouvert():
+            raise PermissionDenied
         form.instance.cagnotte = cagnotte
         form.instance.responsable = self.request.user
         messages.success(self.request, "Votre proposition a été correctement ajoutée !")
         return super().form_valid(form)
 
 
-class PropositionDetailView(DetailView):
+@method_decorator(anonymous_page, name="dispatch")
+@method_decorator(public_page, name="dispatch")
+class PropositionDetailView(AsyncViewMixin, DetailView):
     """view a Proposition details."""
 
     object: Proposition  # noqa: A003
-    model = Proposition
+    queryset = Proposition.objects.with_offer_stats().select_related(
+        "cagnotte__responsable",
+        "responsable",
+    )
 
     def get_context_data(self, **kwargs) -> dict:
-        """Add today's date and the Cagnotte to the context."""
+        """Add today's date, the Cagnotte and the Offres to the context."""
         return super().get_context_data(
             today=date.today(),
             cagnotte=self.object.cagnotte,
+            offres=with_remarques(self.object.offre_set.select_related("beneficiaire")),
             **kwargs,
         )
 
 
+def with_remarques(offres: QuerySet) -> QuerySet:
+    """Tell if Offres have remarques, which offre_remarques fetches one by one."""
+    return offres.defer("remarques").annotate(
+        a_remarques=ExpressionWrapper(~Q(remarques=""), output_field=BooleanField()),
+    )
+
+
+def propositions_page(request: HttpRequest, cagnotte: Cagnotte) -> dict:
+    """Get a page of the proposition grid of a Cagnotte.
+
+    With the "disponibles" GET parameter, only the available Propositions, and after
+    the "apres" one, the next page.
+    """
+    propositions = cagnotte.proposition_set.with_offer_stats()
+    if "disponibles" in request.GET:
+        propositions = propositions.disponibles()
+    propositions = keyset(propositions, "prix", request.GET.get("apres"))
+    return {"page": KeysetPage(propositions, "prix", PROPOSITIONS_PAGE)}
+
+
+@anonymous_page
+@public_page
+def cagnotte_progres(request: HttpRequest, slug: str) -> HttpResponse:
+    """Show the progress bar of a Cagnotte, from its stored totals."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug)
+    return render(
+        request,
+        "cagnottesolidaire/partiels/progres.html",
+        {"cagnotte": cagnotte},
+    )
+
+
+@anonymous_page
+@public_page
+def cagnotte_propositions(request: HttpRequest, slug: str) -> HttpResponse:
+    """Show a page of the proposition grid of a Cagnotte."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug, archivee=False)
+    return render(
+        request,
+        "cagnottesolidaire/partiels/propositions.html",
+        {"cagnotte": cagnotte, **propositions_page(request, cagnotte)},
+    )
+
+
+@anonymous_page
+@public_page
+def cagnotte_demandes(request: HttpRequest, slug: str) -> HttpResponse:
+    """Show the Demandes of a Cagnotte."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug, archivee=False)
+    return render(
+        request,
+        "cagnottesolidaire/partiels/demandes.html",
+        {"cagnotte": cagnotte, "demandes": cagnotte.demande_set.all()},
+    )
+
+
+@login_required
+def cagnotte_tresorerie(request: HttpRequest, slug: str) -> HttpResponse:
+    """Show a page of the valid Offres of a Cagnotte, for its responsable and staff.
+
+    The next page starts after the "apres" GET parameter.
+    """
+    cagnotte = get_object_or_404(Cagnotte, slug=slug, archivee=False)
+    if not request.user.is_staff and cagnotte.responsable_id != request.user.pk:
+        raise PermissionDenied
+    offres = with_remarques(cagnotte.offres().select_related("beneficiaire"))
+    offres = keyset(offres, "id", request.GET.get("apres"))
+    return render(
+        request,
+        "cagnottesolidaire/partiels/tresorerie.html",
+        {"cagnotte": cagnotte, "page": KeysetPage(offres, "id", TRESORERIE_PAGE)},
+    )
+
+
+@login_required
+def offre_remarques(request: HttpRequest, pk: int) -> HttpResponse:
+    """Show the remarques of an Offre, to the responsables of its Proposition."""
+    offre = get_object_or_404(
+        Offre.objects.select_related("proposition__cagnotte"),
+        pk=pk,
+    )
+    responsables = (
+        offre.proposition.responsable_id,
+        offre.proposition.cagnotte.responsable_id,
+    )
+    if not request.user.is_staff and request.user.pk not in responsables:
+        raise PermissionDenied
+    return render(
+        request,
+        "cagnottesolidaire/partiels/remarques.html",
+        {"offre": offre},
+    )
+
+
 class OffreCreateView(LoginRequiredMixin, CreateView):
     """A view to create a new Offre."""
 
@@ -85,8 +331,17 @@ class OffreCreateView(LoginRequiredMixin, CreateView):
     form_class = OffreForm
 
     def get_proposition(self) -> Proposition:
-        """Get the Proposition associated to this Offre."""
-        return get_object_or_404(Proposition, slug=self.kwargs.get("slug", None))
+        """Get the Proposition associated to this Offre, only once."""
+        if not hasattr(self, "proposition"):
+            self.proposition = get_object_or_404(
+                Proposition.objects.with_offer_stats().select_related(
+                    "cagnotte__responsable",
+                    "responsable__preference",
+                ),
+                slug=self.kwargs.get("slug", None),
+                cagnotte__slug=self.kwargs.get("p_slug", None),
+            )
+        return self.proposition
 
     def form_valid(self, form) -> HttpResponse:
         """Validate the Offre creation form."""
@@ -101,36 +356,21 @@ class OffreCreateView(LoginRequiredMixin, CreateView):
             f"Dès qu`elle sera validée par {proposition.responsable_s}, "
             "vous recevrez un mail",
         )
-        if not settings.DEBUG:
-            try:
-                template = "cagnottesolidaire/mails/offre_create.%s"
-                mail, html = (
-                    get_template(template % alt).render({"offre": form.instance})
-                    for alt in ["txt", "html"]
-                )
-
-                proposition.responsable.email_user(
-                    "Nouvelle offre sur votre proposition !",
-                    mail,
-                    html_message=html,
-                )
-            except Exception as e:
-                mail_admins(
-                    "mail d`offre pas envoyé",
-                    f"{form.instance.pk} / {proposition.responsable}:\n{e!r}",
-                )
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            if not settings.DEBUG:
+                notify_offre(form.instance)
+        return response
 
     def get_context_data(self, **kwargs) -> dict:
         """Add context to the view."""
-        cagnotte = get_object_or_404(Cagnotte, slug=self.kwargs.get("p_slug", None))
         proposition = self.get_proposition()
         count = Offre.objects.filter(
             proposition=proposition,
             beneficiaire=self.request.user,
         ).count()  # type: ignore
         return super().get_context_data(
-            cagnotte=cagnotte,
+            cagnotte=proposition.cagnotte,
             proposition=proposition,
             count=count,
             object=proposition,
@@ -143,12 +383,14 @@ class OffreCreateView(LoginRequiredMixin, CreateView):
         return {"prix": prop.prix, "proposition": prop}
 
 
-class OffreListView(LoginRequiredMixin, ListView):
+class OffreListView(AsyncViewMixin, LoginRequiredMixin, ListView):
     """A view to list the current user's Offres."""
 
     def get_queryset(self) -> QuerySet:
         """Get only the current user's Offres."""
-        return Offre.objects.filter(beneficiaire=self.request.user)  # type: ignore
+        return Offre.objects.filter(
+            beneficiaire=self.request.user,  # type: ignore
+        ).select_related("proposition__cagnotte")
 
 
 class PropositionListView(LoginRequiredMixin, ListView):
@@ -156,7 +398,28 @@ class PropositionListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self) -> QuerySet:
         """Get only the current user's Propositions."""
-        return Proposition.objects.filter(responsable=self.request.user)
+        return (
+            Proposition.objects.filter(responsable=self.request.user)
+            .with_offer_stats()
+            .select_related("cagnotte")
+        )
+
+
+class PreferenceUpdateView(LoginRequiredMixin, UpdateView):
+    """A view to choose how often to be told about the new Offres."""
+
+    model = Preference
+    fields = ("frequence",)
+
+    def get_object(self, queryset=None) -> Preference:
+        """Get the Preference of the current user, created on the first save."""
+        preference = Preference.objects.filter(user=self.request.user).first()
+        return preference or Preference(user=self.request.user)
+
+    def form_valid(self, form) -> HttpResponse:
+        """Validate the Preference form."""
+        messages.success(self.request, "Vos préférences ont été enregistrées !")
+        return super().form_valid(form)
 
 
 class OffreDetailView(IsUserOrAboveMixin, DetailView):
@@ -198,76 +461,300 @@ class DemandeDeleteView(IsUserOrAboveMixin, DeleteView):
         return self.get_object().demandeur
 
 
+@use_primary
 @login_required
 def offre_ok(request: HttpRequest, pk: int) -> HttpResponse:
     """When a Proposition's responsable accepts an Offre."""
-    offre = get_object_or_404(Offre, pk=pk)
-    if offre.proposition.responsable != request.user:
+    offre = get_object_or_404(
+        Offre.objects.select_related(
+            "proposition__responsable",
+            "proposition__cagnotte__responsable",
+            "beneficiaire",
+        ),
+        pk=pk,
+    )
+    if offre.proposition.responsable_id != request.user.pk:
         raise PermissionDenied
-    offre.valide = True
-    offre.save()
+    try:
+        with transaction.atomic():
+            offre.valide = True
+            offre.save()
+            enqueue(
+                offre.beneficiaire,
+                "Votre offre a été acceptée !",
+                "cagnottesolidaire/mails/offre_ok",
+                {"offre": offre},
+            )
+    except ValidationError as e:
+        messages.error(request, " ".join(e.messages))
+        return redirect(offre)
     messages.success(
         request,
         f"Vous avez accepté l`offre de {offre.beneficiaire_s}, "
         "un mail lui a été envoyé",
     )
-    try:
-        template = "cagnottesolidaire/mails/offre_ok.%s"
-        mail, html = (
-            get_template(template % alt).render({"offre": offre})
-            for alt in ["txt", "html"]
-        )
-        offre.beneficiaire.email_user(
-            "Votre offre a été acceptée !",
-            mail,
-            html_message=html,
-        )
-    except Exception as e:
-        mail_admins(
-            "mail d`offre OK pas envoyé",
-            f"{offre.pk} / {offre.beneficiaire_s}:\n{e!r}",
-        )
     return redirect(offre)
 
 
+@use_primary
 @login_required
 def offre_ko(request: HttpRequest, pk: int) -> HttpResponse:
     """When a Proposition's responsable denies an Offre."""
-    offre = get_object_or_404(Offre, pk=pk)
-    if offre.proposition.responsable != request.user:
+    offre = get_object_or_404(
+        Offre.objects.select_related(
+            "proposition__responsable",
+            "proposition__cagnotte__responsable",
+            "beneficiaire",
+        ),
+        pk=pk,
+    )
+    if offre.proposition.responsable_id != request.user.pk:
         raise PermissionDenied
-    offre.valide = False
-    offre.save()
+    with transaction.atomic():
+        offre.valide = False
+        offre.save()
+        enqueue(
+            offre.beneficiaire,
+            "Votre offre a été refusée",
+            "cagnottesolidaire/mails/offre_ko",
+            {"offre": offre},
+        )
     messages.warning(
         request,
         f"Vous avez refusé l`offre de {offre.beneficiaire_s}, un mail lui a été envoyé",
     )
-    try:
-        template = "cagnottesolidaire/mails/offre_ko.%s"
-        mail, html = (
-            get_template(template % alt).render({"offre": offre})
-            for alt in ["txt", "html"]
-        )
-        offre.beneficiaire.email_user(
-            "Votre offre a été refusée",
-            mail,
-            html_message=html,
-        )
-    except Exception as e:
-        mail_admins(
-            "mail d`offre KO pas envoyé",
-            f"{offre.pk} / {offre.beneficiaire_s}:\n{e!r}",
-        )
     return redirect(offre)
 
 
+@use_primary
 @login_required
 def offre_paye(request: HttpRequest, pk: int) -> HttpResponse:
     """When an Offre's payment has been processed."""
-    offre = get_object_or_404(Offre, pk=pk)
-    if offre.proposition.cagnotte.responsable != request.user or not offre.valide:
+    offre = get_object_or_404(
+        Offre.objects.select_related("proposition__cagnotte"),
+        pk=pk,
+    )
+    cagnotte = offre.proposition.cagnotte
+    if cagnotte.responsable_id != request.user.pk or not offre.valide:
         raise PermissionDenied
     offre.paye = True
     offre.save()
     messages.success(request, f"L`offre {offre.pk} a bien été marquée comme payée !")
-    return redirect(offre.proposition.cagnotte)
+    return redirect(cagnotte)
+
+
+def selected_pks(request: HttpRequest) -> list[int]:
+    """Get the pks of the Offres checked in a bulk form."""
+    return [int(pk) for pk in request.POST.getlist("offres") if pk.isdigit()]
+
+
+@require_POST
+@login_required
+def offres_proposition(request: HttpRequest, p_slug: str, slug: str) -> HttpResponse:
+    """When a Proposition's responsable accepts or denies many Offres at once."""
+    proposition = get_object_or_404(
+        Proposition.objects.select_related("cagnotte__responsable", "responsable"),
+        slug=slug,
+        cagnotte__slug=p_slug,
+    )
+    if proposition.responsable_id != request.user.pk:
+        raise PermissionDenied
+    action = request.POST.get("action")
+    if action not in ("ok", "ko"):
+        raise PermissionDenied
+    selection = selected_pks(request)
+    offres = proposition.offre_set.filter(pk__in=selection)
+    with transaction.atomic():
+        pks = offres.accepter() if action == "ok" else offres.refuser()
+        offres = Offre.objects.filter(pk__in=pks).select_related("beneficiaire")
+        for offre in offres:
+            offre.proposition = proposition
+        enqueue_all(
+            "Votre offre a été acceptée !"
+            if action == "ok"
+            else "Votre offre a été refusée",
+            f"cagnottesolidaire/mails/offre_{action}",
+            [(offre.beneficiaire, {"offre": offre}) for offre in offres],
+        )
+    verbe = "accepté" if action == "ok" else "refusé"
+    messages.success(
+        request,
+        f"Vous avez {verbe} {len(pks)} offre(s), un mail a été envoyé à chacun",
+    )
+    if len(pks) < len(selection):
+        messages.warning(
+            request,
+            f"{len(selection) - len(pks)} offre(s) n`ont pas pu être modifiées: "
+            "déjà traitées, ou plus de place sur cette proposition",
+        )
+    return redirect(proposition)
+
+
+@require_POST
+@login_required
+def offres_paye(request: HttpRequest, slug: str) -> HttpResponse:
+    """When the payments of many Offres have been processed."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug)
+    if cagnotte.responsable_id != request.user.pk:
+        raise PermissionDenied
+    pks = Offre.objects.filter(
+        proposition__cagnotte=cagnotte,
+        pk__in=selected_pks(request),
+    ).encaisser()
+    messages.success(request, f"{len(pks)} offre(s) marquée(s) comme payée(s) !")
+    return redirect(cagnotte)
+
+
+@login_required
+def rapprochement(request: HttpRequest, slug: str) -> HttpResponse:
+    """Match a bank statement with the unpaid Offres of a Cagnotte, then mark them.
+
+    The upload shows what would be marked as payed, to confirm with a second POST.
+    """
+    cagnotte = get_object_or_404(Cagnotte, slug=slug)
+    if cagnotte.responsable_id != request.user.pk:
+        raise PermissionDenied
+    if "confirmer" in request.POST:
+        offres = apply(cagnotte, selected_pks(request))
+        messages.success(
+            request,
+            f"{len(offres)} offre(s) marquée(s) comme payée(s) !",
+        )
+        return redirect(cagnotte)
+    form = ReleveForm(request.POST or None, request.FILES or None)
+    resultat = None
+    if form.is_valid():
+        lignes = io.TextIOWrapper(
+            form.cleaned_data["releve"].file,
+            encoding=form.cleaned_data["encodage"],
+            newline="",
+        )
+        try:
+            resultat = reconcile(cagnotte, parse(lignes))
+        except ValidationError as e:
+            form.add_error("releve", e)
+        except UnicodeDecodeError:
+            form.add_error("releve", "Ce fichier n`est pas dans cet encodage")
+    return render(
+        request,
+        "cagnottesolidaire/rapprochement.html",
+        {"cagnotte": cagnotte, "form": form, "resultat": resultat},
+    )
+
+
+class Echo:
+    """A pseudo-buffer for csv.writer, giving back what should be written."""
+
+    def write(self, value: str) -> str:
+        """Don't write, return."""
+        return value
+
+
+def csv_cell(value: object) -> object:
+    """Escape a text that a spreadsheet would run as a formula."""
+    if isinstance(value, str) and value.startswith(("=", "+", "-", "@", "\t", "\r")):
+        return f"'{value}"
+    return value
+
+
+@login_required
+def offre_export(request: HttpRequest, slug: str) -> HttpResponse:
+    """Stream all the Offres of a Cagnotte as CSV, for its responsable and staff."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug)
+    if not request.user.is_staff and cagnotte.responsable_id != request.user.pk:
+        raise PermissionDenied
+    offres = (
+        Offre.objects.filter(proposition__cagnotte=cagnotte)
+        .select_related("beneficiaire", "proposition")
+        .order_by("pk")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    header = [
+        "Numéro",
+        "Proposition",
+        "Prix",
+        "Validée",
+        "Payée",
+        "Personne",
+        "Email",
+        "Remarques",
+    ]
+    rows = (
+        [
+            offre.pk,
+            offre.proposition.name,
+            offre.prix,
+            {None: "", True: "oui", False: "non"}[offre.valide],
+            "oui" if offre.paye else "non",
+            offre.beneficiaire.get_full_name() or offre.beneficiaire_s,
+            offre.beneficiaire.email,
+            offre.remarques,
+        ]
+        for offre in offres
+    )
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (
+            writer.writerow([csv_cell(cell) for cell in row])
+            for row in chain([header], rows)
+        ),
+        content_type="text/csv; charset=utf-8",
+    )
+    response["Content-Disposition"] = f'attachment; filename="{slug}-offres.csv"'
+    return response
+
+
+def proposition_data(request: HttpRequest, proposition: Proposition) -> dict:
+    """Get the public data of a Proposition, as JSON."""
+    return {
+        "name": proposition.name,
+        "slug": proposition.slug,
+        "url": request.build_absolute_uri(proposition.get_absolute_url()),
+        "prix": proposition.prix,
+        "beneficiaires": proposition.beneficiaires,
+        "restants": proposition.restants,
+        "offrable": proposition.offrable(),
+    }
+
+
+@cache_validators
+def cagnotte_api(request: HttpRequest, slug: str) -> HttpResponse:
+    """Get the totals, progress, deadlines and Propositions of a Cagnotte as JSON."""
+    cagnotte = get_object_or_404(Cagnotte, slug=slug)
+    return JsonResponse(
+        {
+            "name": cagnotte.name,
+            "slug": cagnotte.slug,
+            "url": request.build_absolute_uri(cagnotte.get_absolute_url()),
+            "finances": cagnotte.finances,
+            "somme": cagnotte.somme(),
+            "nb_offres": cagnotte.nb_offres,
+            "progress": cagnotte.progress(),
+            "fin_depot": cagnotte.fin_depot,
+            "fin_achat": cagnotte.fin_achat,
+            "etat": cagnotte.get_etat_display(),
+            "propositions": [
+                proposition_data(request, proposition)
+                for proposition in cagnotte.proposition_set.all()
+            ],
+        },
+    )
+
+
+@cache_validators
+def proposition_api(request: HttpRequest, p_slug: str, slug: str) -> HttpResponse:
+    """Get the availability and Offres count of a Proposition as JSON."""
+    proposition = get_object_or_404(
+        Proposition.objects.with_offer_stats().select_related("cagnotte"),
+        slug=slug,
+        cagnotte__slug=p_slug,
+    )
+    return JsonResponse(
+        {
+            "cagnotte": proposition.cagnotte.slug,
+            "fin_achat": proposition.cagnotte.fin_achat,
+            "offres": proposition.offres_valides,
+            "somme": proposition.somme(),
+            **proposition_data(request, proposition),
+        },
+    )
@@ -0,0 +1,9 @@
+"""ASGI entrypoint of Cagnotte Solidaire's test project, serving the async views."""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testproject.settings")
+os.environ.setdefault("ASYNC_VIEWS", "True")
+
+application = get_asgi_application()
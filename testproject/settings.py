@@ -31,12 +31,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "cagnottesolidaire.routers.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "cagnottesolidaire.queries.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "testproject.urls"
@@ -58,6 +60,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "testproject.wsgi.application"
+ASGI_APPLICATION = "testproject.asgi.application"
+# serve the read-only views as coroutines, set by testproject.asgi
+CAGNOTTESOLIDAIRE_ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "False").lower() == "true"
 
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
@@ -77,6 +82,13 @@ if DB == "postgres":
         HOST=os.environ.get("POSTGRES_HOST", DB),
         PASSWORD=os.environ["POSTGRES_PASSWORD"],
     )
+# a streaming replica of the primary, mirrored in tests
+DATABASES["replica"] = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+DATABASE_ROUTERS = ["cagnottesolidaire.routers.ReplicaRouter"]
+CAGNOTTESOLIDAIRE_REPLICAS = []
+if "POSTGRES_REPLICA_HOST" in os.environ:
+    DATABASES["replica"]["HOST"] = os.environ["POSTGRES_REPLICA_HOST"]
+    CAGNOTTESOLIDAIRE_REPLICAS = ["replica"]
 
 _APV = "django.contrib.auth.password_validation"
 AUTH_PASSWORD_VALIDATORS = [
@@ -107,6 +119,45 @@ STATIC_URL = "/static/"
 STATIC_ROOT = "/srv/static/"
 LOGIN_REDIRECT_URL = "/"
 
+CAGNOTTESOLIDAIRE_QUERY_BUDGETS = {
+    "cagnottesolidaire:cagnotte_list": 3,
+    "cagnottesolidaire:cagnotte_archives": 3,
+    "cagnottesolidaire:recherche": 6,
+    "cagnottesolidaire:cagnotte_create": 2,
+    "cagnottesolidaire:cagnotte": 4,
+    "cagnottesolidaire:cagnotte_progres": 3,
+    "cagnottesolidaire:cagnotte_propositions": 4,
+    "cagnottesolidaire:cagnotte_demandes": 4,
+    "cagnottesolidaire:cagnotte_tresorerie": 4,
+    "cagnottesolidaire:proposition_create": 2,
+    "cagnottesolidaire:proposition": 4,
+    "cagnottesolidaire:offre_create": 5,
+    # POST only: checked in test_bulk
+    "cagnottesolidaire:offres_proposition": 14,
+    "cagnottesolidaire:offres_paye": 8,
+    "cagnottesolidaire:rapprochement": 3,
+    "cagnottesolidaire:offre_export": 3,
+    "cagnottesolidaire:offre_list": 3,
+    "cagnottesolidaire:offre": 5,
+    "cagnottesolidaire:offre_ok": 12,
+    "cagnottesolidaire:offre_ko": 12,
+    "cagnottesolidaire:offre_paye": 8,
+    "cagnottesolidaire:offre_remarques": 3,
+    "cagnottesolidaire:proposition_list": 3,
+    "cagnottesolidaire:preferences": 3,
+    "cagnottesolidaire:cagnotte_api": 3,
+    "cagnottesolidaire:proposition_api": 2,
+    "cagnottesolidaire:demande_create": 2,
+    "cagnottesolidaire:demande_delete": 5,
+}
+
+# serve the pages of anonymous visitors from the cache
+CAGNOTTESOLIDAIRE_PAGE_CACHE = os.environ.get("PAGE_CACHE", "False").lower() == "true"
+# cache the propositions and the treasurer table of the Cagnottes
+CAGNOTTESOLIDAIRE_FRAGMENT_CACHE = (
+    os.environ.get("FRAGMENT_CACHE", "False").lower() == "true"
+)
+
 if os.environ.get("MEMCACHED", "False").lower() == "true":
     CACHES = {
         "default": {
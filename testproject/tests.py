@@ -1,12 +1,61 @@
 """Main test module for Cagnotte Solidaire."""
-from datetime import date
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
 from django.contrib.auth.models import User
 from django.core import mail
-from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, router
+from django.db.models.signals import pre_save
+from django.http import Http404, HttpResponse
+from django.test import (
+    LiveServerTestCase,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from cagnottesolidaire.models import Cagnotte, Demande, Offre, Proposition
+from asgiref.sync import async_to_sync
+from PIL import Image
+
+from cagnottesolidaire import (
+    benchmark,
+    caching,
+    mails,
+    reconciliation,
+    routers,
+    search,
+    urls,
+    views,
+)
+from cagnottesolidaire.management.commands import load_test
+from cagnottesolidaire.models import (
+    Cagnotte,
+    Demande,
+    Notification,
+    Offre,
+    OutgoingMail,
+    Preference,
+    Proposition,
+)
+from cagnottesolidaire.queries import QueryBudgetTestMixin
 
 
 def strpdate(s: str) -> date:
@@ -15,7 +64,7 @@ def strpdate(s: str) -> date:
     return date(y, m, d)
 
 
-class TestCagnotte(TestCase):
+class TestCagnotte(QueryBudgetTestMixin, TestCase):
     """Mait test class for Cagnotte Solidaire."""
 
     def setUp(self):
@@ -105,6 +154,42 @@ class TestCagnotte(TestCase):
             200,
         )
 
+    def test_cagnotte_list(self):
+        """Check the keyset pagination of the open and closed Cagnottes."""
+        guy = User.objects.first()
+        today = date.today()
+        for i in range(-5, 30):
+            Cagnotte.objects.create(
+                name=f"liste {i}",
+                responsable=guy,
+                objectif="nothing",
+                finances=43,
+                fin_depot=today + timedelta(days=i // 2 - 1),
+                fin_achat=today + timedelta(days=i // 2),
+            )
+        url = reverse("cagnottesolidaire:cagnotte_list")
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertNotIn("COUNT", " ".join(q["sql"] for q in ctx))
+            seen += r.context["cagnotte_list"]
+            cursor = r.context["next_cursor"]
+            url = cursor and f"{r.request['PATH_INFO']}?apres={cursor}"
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(seen, sorted(seen, key=lambda c: (c.fin_achat, c.pk)))
+        self.assertGreaterEqual(seen[0].fin_achat, today)
+
+        r = self.client.get(reverse("cagnottesolidaire:cagnotte_archives"))
+        archives = r.context["cagnotte_list"]
+        self.assertEqual(len(archives), 5)
+        self.assertIsNone(r.context["next_cursor"])
+        self.assertTrue(all(c.fin_achat < today for c in archives))
+        self.assertEqual(archives[0].fin_achat, today - timedelta(days=1))
+        url = reverse("cagnottesolidaire:cagnotte_list")
+        self.assertEqual(self.client.get(f"{url}?apres=pipo").status_code, 404)
+
     def test_proposition(self):
         """Perform tests on the Proposition model."""
         guy = User.objects.first()
@@ -115,8 +200,8 @@ class TestCagnotte(TestCase):
             responsable=guy,
             objectif="nothing",
             finances=43,
-            fin_depot=date(2017, 12, 31),
-            fin_achat=date(2018, 12, 31),
+            fin_depot=date.today(),
+            fin_achat=date.today(),
         )
         projd = {"slug": proj.slug}
         propd = {"p_slug": proj.slug, "slug": "propo"}
@@ -179,6 +264,16 @@ class TestCagnotte(TestCase):
             200,
         )
 
+        # after fin_depot, even before process_deadlines
+        Cagnotte.objects.filter(pk=proj.pk).update(fin_depot=date(2017, 12, 31))
+        proposition_data["name"] = "Propo 2"
+        r = self.client.post(
+            reverse("cagnottesolidaire:proposition_create", kwargs=projd),
+            proposition_data,
+        )
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(Proposition.objects.count(), 1)
+
     def test_offre(self):
         """Perform tests on the Offre model."""
         guy = User.objects.first()
@@ -232,6 +327,9 @@ class TestCagnotte(TestCase):
         )
         self.assertEqual(Offre.objects.count(), 1)
         self.assertEqual(r.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingMail.objects.count(), 1)
+        call_command("send_outbox", stdout=StringIO())
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(r.url, reverse("cagnottesolidaire:proposition", kwargs=propd))
         self.assertEqual(
@@ -349,6 +447,1113 @@ class TestCagnotte(TestCase):
         self.assertEqual(self.client.get(paye).status_code, 302)
         self.assertEqual(Offre.objects.first().paye, True)
 
+    def test_totals(self):
+        """Check the stored totals of a Cagnotte follow its Offres."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="totals",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date(2017, 12, 31),
+            fin_achat=date(2018, 12, 31),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=0,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=prix, beneficiaire=c)
+            for prix in (20, 30, 50)
+        ]
+
+        def totals():
+            proj.refresh_from_db()
+            return proj.somme(), proj.somme_encaissee(), proj.nb_offres
+
+        self.assertEqual(totals(), (0, 0, 0))
+        self.client.login(username="b", password="b")
+        for offre in offres:
+            self.client.get(reverse("cagnottesolidaire:offre_ok", args=[offre.pk]))
+        self.assertEqual(totals(), (100, 0, 3))
+        self.assertEqual(proj.progress(), 100)
+        self.client.get(reverse("cagnottesolidaire:offre_ko", args=[offres[1].pk]))
+        self.assertEqual(totals(), (70, 0, 2))
+        self.client.login(username="a", password="a")
+        self.client.get(reverse("cagnottesolidaire:offre_paye", args=[offres[2].pk]))
+        self.assertEqual(totals(), (70, 50, 2))
+
+        # admin edits and deletions
+        offres[0].refresh_from_db()
+        offres[0].prix = 25
+        offres[0].save()
+        self.assertEqual(totals(), (75, 50, 2))
+        offres[2].refresh_from_db()
+        offres[2].delete()
+        self.assertEqual(totals(), (25, 0, 1))
+        self.client.get(reverse("cagnottesolidaire:offre_paye", args=[offres[0].pk]))
+        self.assertEqual(totals(), (25, 25, 1))
+
+        Cagnotte.objects.update(total_promis=0, total_encaisse=0, nb_offres=0)
+        call_command("recompute_totals", stdout=StringIO())
+        self.assertEqual(totals(), (25, 25, 1))
+
+    def test_constant_queries(self):
+        """Check the detail pages run the same number of queries whatever the size."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="big",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date(2017, 12, 31),
+            fin_achat=date(2018, 12, 31),
+        )
+        urls = [
+            reverse("cagnottesolidaire:cagnotte", kwargs={"slug": proj.slug}),
+            reverse("cagnottesolidaire:proposition_list"),
+            reverse(
+                "cagnottesolidaire:cagnotte_propositions",
+                kwargs={"slug": proj.slug},
+            ),
+            reverse(
+                "cagnottesolidaire:cagnotte_tresorerie",
+                kwargs={"slug": proj.slug},
+            ),
+        ]
+
+        def grow(n):
+            for i in range(n):
+                prop = Proposition.objects.create(
+                    name=f"big {n} {i}",
+                    description="nope",
+                    prix=20,
+                    cagnotte=proj,
+                    responsable=a,
+                    beneficiaires=0,
+                )
+                for guy in (b, c):
+                    Offre.objects.create(
+                        proposition=prop,
+                        prix=20,
+                        beneficiaire=guy,
+                        valide=True,
+                        remarques="hop",
+                    )
+            urls.append(prop.get_absolute_url())
+
+        def queries():
+            counts = []
+            for url in urls:
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                counts.append(len(ctx))
+            return counts
+
+        self.client.login(username="a", password="a")
+        grow(2)
+        small = queries()
+        grow(5)
+        self.assertEqual(queries(), small + small[4:])
+
+    def test_outbox(self):
+        """Check the mails are sent from the outbox, with retries and abandons."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="outbox",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date(2017, 12, 31),
+            fin_achat=date(2018, 12, 31),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=0,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=22, beneficiaire=c)
+            for _ in range(3)
+        ]
+        self.client.login(username="b", password="b")
+        for offre, view in zip(offres, ["ok", "ko", "ok"], strict=True):
+            url = reverse(f"cagnottesolidaire:offre_{view}", kwargs={"pk": offre.pk})
+            self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingMail.objects.count(), 3)
+
+        # SMTP failures are retried later, then abandoned
+        send = "django.core.mail.backends.locmem.EmailBackend.send_messages"
+        with mock.patch(send, side_effect=OSError("SMTP down")):
+            call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        pending = OutgoingMail.objects.filter(statut=OutgoingMail.Statut.EN_ATTENTE)
+        self.assertEqual(pending.filter(tentatives=1).count(), 3)
+        self.assertIn("SMTP down", pending.first().erreur)
+        call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)  # not yet
+
+        OutgoingMail.objects.filter(pk=pending.first().pk).update(tentatives=4)
+        OutgoingMail.objects.update(prochain_essai=timezone.now())
+        with mock.patch(send, side_effect=OSError("SMTP down")):
+            call_command("send_outbox", stdout=StringIO())
+        self.assertEqual(
+            OutgoingMail.objects.filter(statut=OutgoingMail.Statut.ABANDONNE).count(),
+            1,
+        )
+
+        # claimed mails are leased to their worker
+        OutgoingMail.objects.update(prochain_essai=timezone.now())
+        self.assertEqual(len(mails.claim(1)), 1)
+        self.assertEqual(len(mails.claim(10)), 1)
+        self.assertEqual(mails.claim(10), [])
+
+        OutgoingMail.objects.update(prochain_essai=timezone.now())
+        call_command("send_outbox", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["c@example.org"])
+        self.assertEqual(len(mail.outbox[0].alternatives), 1)
+        self.assertEqual(
+            OutgoingMail.objects.filter(statut=OutgoingMail.Statut.ENVOYE).count(),
+            2,
+        )
+
+    def test_restants(self):
+        """Check the remaining places of a Proposition follow its valid Offres."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="places",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=2,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=22, beneficiaire=c)
+            for _ in range(3)
+        ]
+        self.assertEqual(prop.restants, 2)
+        self.assertEqual(list(Proposition.objects.disponibles()), [prop])
+        self.client.login(username="b", password="b")
+        for offre in offres:
+            self.client.get(reverse("cagnottesolidaire:offre_ok", args=[offre.pk]))
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+        self.assertFalse(prop.offrable())
+        self.assertEqual(list(Proposition.objects.disponibles()), [])
+        self.assertEqual(Offre.objects.filter(valide=True).count(), 2)
+        self.assertEqual(Offre.objects.filter(valide=None).count(), 1)
+        proj.refresh_from_db()
+        self.assertEqual(proj.nb_offres, 2)
+
+        self.client.get(reverse("cagnottesolidaire:offre_ko", args=[offres[0].pk]))
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 1)
+        self.client.get(reverse("cagnottesolidaire:offre_ok", args=[offres[2].pk]))
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+
+        # more places from the admin
+        prop.beneficiaires = 3
+        prop.save()
+        self.assertEqual(prop.restants, 1)
+        self.assertTrue(prop.offrable())
+        prop.beneficiaires = 0
+        prop.save()
+        self.assertIsNone(prop.restants)
+        self.assertTrue(prop.offrable())
+
+    def test_api(self):
+        """Check the JSON API, and its answers to conditional GETs."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="api",
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=1,
+        )
+        url = reverse("cagnottesolidaire:cagnotte_api", kwargs={"slug": "api"})
+        prop_url = reverse(
+            "cagnottesolidaire:proposition_api",
+            kwargs={"p_slug": "api", "slug": "pipo"},
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["somme"], "0.00")
+        self.assertEqual(data["progress"], 0)
+        self.assertEqual(data["fin_achat"], date.today().isoformat())
+        self.assertEqual(
+            data["propositions"][0]["url"],
+            f"http://testserver{prop.get_absolute_url()}",
+        )
+        self.assertTrue(data["propositions"][0]["offrable"])
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertIn("Last-Modified", response)
+
+        # 304, without any aggregate
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(prop_url).json()["offres"], 0)
+
+        # a new offre changes the ETag, even before it is accepted
+        offre = Offre.objects.create(proposition=prop, prix=20, beneficiaire=c)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+        offre.valide = True
+        offre.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["progress"], 50)
+        self.assertFalse(response.json()["propositions"][0]["offrable"])
+        data = self.client.get(prop_url).json()
+        self.assertEqual(data["offres"], 1)
+        self.assertEqual(data["restants"], 0)
+
+        self.assertEqual(
+            self.client.get(url.replace("api", "nope", 2)).status_code,
+            404,
+        )
+        prop_url = reverse(
+            "cagnottesolidaire:proposition_api",
+            kwargs={"p_slug": "nope", "slug": "pipo"},
+        )
+        self.assertEqual(self.client.get(prop_url).status_code, 404)
+
+    def test_conditional_pages(self):
+        """Check anonymous visitors can revalidate the detail pages."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="pages",
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+        )
+        for url in [proj.get_absolute_url(), prop.get_absolute_url()]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("public", response["Cache-Control"])
+            self.assertIn("must-revalidate", response["Cache-Control"])
+            self.assertIn("Cookie", response["Vary"])
+            etag = response["ETag"]
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            # a new demande or offre changes the pages
+            Demande.objects.create(cagnotte=proj, demandeur=c, description="hi")
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+            Offre.objects.create(proposition=prop, prix=20, beneficiaire=c)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+            # logged-in pages are private
+            self.client.force_login(a)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("private", response["Cache-Control"])
+            self.assertNotIn("ETag", response)
+            self.client.logout()
+
+    def test_page_cache(self):
+        """Cache the anonymous pages, and forget them after each write."""
+        a, b, c, s = User.objects.all()
+        with tempfile.TemporaryDirectory() as directory:
+            for backend, location in [
+                ("locmem.LocMemCache", "pages"),
+                ("filebased.FileBasedCache", directory),
+            ]:
+                cache = {"BACKEND": f"django.core.cache.backends.{backend}"}
+                with self.subTest(backend=backend), self.settings(
+                    CACHES={"default": dict(cache, LOCATION=location)},
+                    CAGNOTTESOLIDAIRE_PAGE_CACHE=True,
+                ):
+                    self.check_page_cache(a, c, backend.split(".")[0].lower())
+
+    def check_page_cache(self, a: User, c: User, name: str):
+        """Check the page cache of one backend."""
+        proj = Cagnotte.objects.create(
+            name=name,
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name=f"Pipo {name}",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=a,
+        )
+        list_url = reverse("cagnottesolidaire:cagnotte_list")
+        demandes = reverse(
+            "cagnottesolidaire:cagnotte_demandes",
+            kwargs={"slug": proj.slug},
+        )
+        for url in [
+            proj.get_absolute_url(),
+            prop.get_absolute_url(),
+            demandes,
+            list_url,
+        ]:
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.content, first.content)
+            if url != list_url:
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+                self.assertEqual(response.status_code, 304)
+
+        # offres, even in bulk, demandes and propositions change their pages
+        offre = Offre.objects.create(proposition=prop, prix=20, beneficiaire=c)
+        Offre.objects.filter(pk=offre.pk).accepter()
+        self.assertContains(self.client.get(proj.get_absolute_url()), "width: 50%")
+        Demande.objects.create(cagnotte=proj, demandeur=c, description="massage")
+        self.assertContains(self.client.get(demandes), "massage")
+        prop.description = "changed"
+        prop.save()
+        self.assertContains(self.client.get(prop.get_absolute_url()), "changed")
+        self.assertNotContains(self.client.get(list_url), f"other {name}")
+        Cagnotte.objects.create(
+            name=f"other {name}",
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        self.assertContains(self.client.get(list_url), f"other {name}")
+
+        # logged-in pages are not cached
+        self.client.force_login(a)
+        self.client.get(proj.get_absolute_url())
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(proj.get_absolute_url())
+        self.assertGreater(len(queries), 0)
+        self.client.logout()
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "fragments",
+            },
+        },
+        CAGNOTTESOLIDAIRE_FRAGMENT_CACHE=True,
+    )
+    def test_fragments(self):
+        """Cache the propositions and the treasurer table until the Cagnotte changes."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="fragments",
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+        )
+        offre = Offre.objects.create(proposition=prop, prix=20, beneficiaire=c)
+        url = proj.get_absolute_url()
+        tresorerie = reverse(
+            "cagnottesolidaire:cagnotte_tresorerie",
+            kwargs={"slug": proj.slug},
+        )
+        self.client.force_login(a)
+        for page in [url, tresorerie]:
+            with CaptureQueriesContext(connection) as miss:
+                self.client.get(page)
+            with CaptureQueriesContext(connection) as hit:
+                self.client.get(page)
+            self.assertLess(len(hit), len(miss))
+        response = self.client.get(url)
+        self.assertContains(response, "Pipo")
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertEqual(
+            caching.fragment_stats(caching.FRAGMENTS),
+            {
+                "propositions": {"hits": 2, "misses": 1, "ratio": 0.667},
+                "tresorerie": {"hits": 1, "misses": 1, "ratio": 0.5},
+            },
+        )
+
+        # another user, and another filter, get their own fragments
+        self.client.force_login(s)
+        self.assertContains(self.client.get(tresorerie), "pas encore d")
+        self.assertContains(self.client.get(f"{url}?disponibles"), "Pipo")
+
+        # a write changes the fragments
+        Offre.objects.filter(pk=offre.pk).accepter()
+        self.assertNotContains(self.client.get(f"{url}?disponibles"), "Pipo")
+        self.assertContains(self.client.get(tresorerie), f"<td>{offre.pk}</td>")
+        out = StringIO()
+        call_command("fragment_stats", stdout=out)
+        self.assertIn("propositions: ", out.getvalue())
+
+    def test_partiels(self):
+        """Load the heavy parts of the detail pages from their paginated partials."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="partiels",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        props = [
+            Proposition.objects.create(
+                name=f"prop {prix}",
+                description="nope",
+                prix=prix,
+                cagnotte=proj,
+                responsable=b,
+            )
+            for prix in (10, 20, 30, 40)
+        ]
+        offre = Offre.objects.create(
+            proposition=props[0],
+            prix=10,
+            beneficiaire=c,
+            valide=True,
+            remarques="au chocolat",
+        )
+        Demande.objects.create(cagnotte=proj, demandeur=c, description="massage")
+        kwargs = {"slug": proj.slug}
+
+        # the first page of propositions, and the rest later
+        with mock.patch.object(views, "PROPOSITIONS_PAGE", 3):
+            response = self.client.get(proj.get_absolute_url())
+            for prop in props[:3]:
+                self.assertContains(response, prop.name)
+            self.assertNotContains(response, "prop 40")
+            self.assertNotContains(response, "Nouvelle proposition")
+            self.assertNotContains(response, "massage")
+            self.assertContains(
+                response,
+                reverse("cagnottesolidaire:cagnotte_demandes", kwargs=kwargs),
+            )
+            apres = response.context["page"].next_cursor
+            url = reverse("cagnottesolidaire:cagnotte_propositions", kwargs=kwargs)
+            response = self.client.get(url, {"apres": apres})
+            self.assertContains(response, "prop 40")
+            self.assertContains(response, "Nouvelle proposition")
+            self.assertNotContains(response, "prop 10")
+            self.assertEqual(self.client.get(url, {"apres": "x"}).status_code, 404)
+        self.assertContains(
+            self.client.get(
+                reverse("cagnottesolidaire:cagnotte_progres", kwargs=kwargs),
+            ),
+            "width: 10%",
+        )
+        self.assertContains(
+            self.client.get(
+                reverse("cagnottesolidaire:cagnotte_demandes", kwargs=kwargs),
+            ),
+            "massage",
+        )
+
+        # the treasurer table and the remarques, only for the responsables
+        tresorerie = reverse("cagnottesolidaire:cagnotte_tresorerie", kwargs=kwargs)
+        remarques = reverse(
+            "cagnottesolidaire:offre_remarques",
+            kwargs={"pk": offre.pk},
+        )
+        self.assertEqual(self.client.get(tresorerie).status_code, 302)
+        self.client.force_login(c)
+        self.assertEqual(self.client.get(tresorerie).status_code, 403)
+        self.assertEqual(self.client.get(remarques).status_code, 403)
+        self.client.force_login(a)
+        self.assertNotContains(self.client.get(proj.get_absolute_url()), "chocolat")
+        response = self.client.get(tresorerie)
+        self.assertContains(response, f"<td>{offre.pk}</td>")
+        self.assertContains(response, remarques)
+        self.assertNotContains(response, "chocolat")
+        self.assertContains(self.client.get(remarques), "au chocolat")
+        self.client.force_login(b)
+        self.assertContains(self.client.get(remarques), "au chocolat")
+
+        Cagnotte.objects.filter(pk=proj.pk).update(archivee=True)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_export(self):
+        """Check the CSV export of the Offres of a Cagnotte."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="export",
+            responsable=a,
+            objectif="nothing",
+            finances=40,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=0,
+        )
+        url = reverse("cagnottesolidaire:offre_export", kwargs={"slug": "export"})
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username="c", password="c")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.login(username="s", password="s")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.login(username="a", password="a")
+        response = self.client.get(url)
+        self.assertEqual(b"".join(response.streaming_content).count(b"\n"), 1)
+
+        for i in range(5):
+            Offre.objects.create(
+                proposition=prop,
+                prix=20 + i,
+                beneficiaire=c,
+                valide=i % 2 == 0 or None,
+                paye=i == 0,
+                remarques={1: "un, deux", 3: "=1+1"}.get(i, ""),
+            )
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+            content = b"".join(response.streaming_content).decode()
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="export-offres.csv"',
+        )
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith("Numéro,Proposition,Prix"))
+        self.assertIn(",Pipo,20.00,oui,oui,c,c@example.org,", lines[1])
+        self.assertIn(',Pipo,21.00,,non,c,c@example.org,"un, deux"', lines[2])
+        # no formula runs in the spreadsheet of the treasurer
+        self.assertTrue(lines[4].endswith(",c@example.org,'=1+1"))
+
+    def test_bulk(self):
+        """Check the bulk actions on Offres."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="bulk",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=2,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=20 + i, beneficiaire=c)
+            for i in range(4)
+        ]
+        pks = [offre.pk for offre in offres]
+        url = reverse(
+            "cagnottesolidaire:offres_proposition",
+            kwargs={"p_slug": "bulk", "slug": "pipo"},
+        )
+        paye_url = reverse("cagnottesolidaire:offres_paye", kwargs={"slug": "bulk"})
+
+        self.client.login(username="c", password="c")
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(
+            self.client.post(url, {"action": "ok", "offres": pks}).status_code,
+            403,
+        )
+        self.assertEqual(self.client.post(paye_url, {"offres": pks}).status_code, 403)
+
+        self.client.login(username="b", password="b")
+        self.assertEqual(self.client.post(url, {"offres": pks}).status_code, 403)
+        response = self.assertQueryBudget(
+            url,
+            "post",
+            data={"action": "ok", "offres": pks},
+        )
+        self.assertRedirects(response, prop.get_absolute_url())
+        self.assertEqual(
+            list(Offre.objects.filter(valide=True).values_list("pk", flat=True)),
+            pks[:2],
+        )
+        self.assertEqual(
+            OutgoingMail.objects.filter(sujet="Votre offre a été acceptée !").count(),
+            2,
+        )
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+        proj.refresh_from_db()
+        self.assertEqual((proj.total_promis, proj.nb_offres), (41, 2))
+
+        self.client.post(url, {"action": "ko", "offres": [pks[0], pks[2], "x"]})
+        self.assertEqual(Offre.objects.filter(valide=False).count(), 2)
+        self.assertEqual(
+            OutgoingMail.objects.filter(sujet="Votre offre a été refusée").count(),
+            2,
+        )
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 1)
+        proj.refresh_from_db()
+        self.assertEqual((proj.total_promis, proj.nb_offres), (21, 1))
+
+        self.client.post(url, {"action": "ok", "offres": pks})
+        self.assertEqual(
+            list(Offre.objects.filter(valide=True).values_list("pk", flat=True)),
+            [pks[0], pks[1]],
+        )
+
+        self.client.login(username="a", password="a")
+        response = self.assertQueryBudget(paye_url, "post", data={"offres": pks})
+        self.assertRedirects(response, proj.get_absolute_url())
+        self.assertEqual(Offre.objects.filter(paye=True).count(), 2)
+        proj.refresh_from_db()
+        self.assertEqual((proj.total_promis, proj.total_encaisse), (41, 41))
+        Cagnotte.objects.recompute_totals()
+        proj.refresh_from_db()
+        self.assertEqual((proj.total_promis, proj.total_encaisse), (41, 41))
+
+    def test_reconciliation(self):
+        """Check the bank statement reconciliation, from the view and the command."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="banque",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+            beneficiaires=0,
+        )
+        o1, o2, o3, o4, o5 = (
+            Offre.objects.create(
+                proposition=prop,
+                prix=prix,
+                beneficiaire=c,
+                valide=True,
+                paye=paye,
+            )
+            for prix, paye in [
+                (20, False),
+                (20, False),
+                (30, False),
+                (25, True),
+                (40, False),
+            ]
+        )
+        releve = (
+            "Date;Libellé;Montant\n"
+            f"01/10/2026;VIR M C OFFRE {o1.pk};20,00\n"
+            f"02/10/2026;VIR M C Offre n°{o2.pk};21,00\n"
+            "03/10/2026;VIR M C;30,00\n"
+            "04/10/2026;VIR M C;20,00\n"
+            f"05/10/2026;VIR M C offre {o4.pk};25,00\n"
+            "06/10/2026;FRAIS;-1,50\n"
+            "07/10/2026;VIR M D;1 000,00\n"
+        )
+        url = reverse("cagnottesolidaire:rapprochement", kwargs={"slug": "banque"})
+
+        self.client.login(username="c", password="c")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.login(username="a", password="a")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(
+            url,
+            {
+                "releve": SimpleUploadedFile("releve.csv", releve.encode()),
+                "encodage": "utf-8-sig",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        resultat = response.context["resultat"]
+        self.assertEqual(
+            [(ligne.numero, offre) for ligne, offre in resultat.correspondances],
+            [(2, o1), (4, o3), (5, o2)],
+        )
+        self.assertEqual(resultat.total, 70)
+        self.assertEqual([ligne.numero for ligne, _ in resultat.rejets], [3, 6, 8])
+        self.assertIn("est de 20.00 €", resultat.rejets[0][1])
+        self.assertFalse(Offre.objects.filter(pk=o1.pk, paye=True).exists())
+
+        response = self.client.post(
+            url,
+            {
+                "releve": SimpleUploadedFile("releve.csv", b"Date;Montant\n1;2\n"),
+                "encodage": "utf-8-sig",
+            },
+        )
+        self.assertIsNone(response.context["resultat"])
+        self.assertFormError(
+            response,
+            "form",
+            "releve",
+            "Le relevé n`a pas de colonne «libellé»",
+        )
+        # the last separator is the decimal one, and "1,234" is refused
+        releve_en = ["Date,Label,Amount", '1,VIR,"1,234.56"', '2,VIR,"1.234,56"']
+        self.assertEqual(
+            [ligne.montant for ligne in reconciliation.parse(releve_en)],
+            [Decimal("1234.56"), Decimal("1234.56")],
+        )
+        response = self.client.post(
+            url,
+            {
+                "releve": SimpleUploadedFile(
+                    "releve.csv",
+                    "Date;Libellé;Montant\n1;VIR;1,234\n".encode(),
+                ),
+                "encodage": "utf-8-sig",
+            },
+        )
+        self.assertIsNone(response.context["resultat"])
+        self.assertFormError(response, "form", "releve", "Ligne 2: montant invalide")
+
+        response = self.client.post(url, {"confirmer": "", "offres": [o1.pk, o4.pk]})
+        self.assertRedirects(response, proj.get_absolute_url())
+        self.assertEqual(Offre.objects.filter(paye=True).count(), 2)
+        proj.refresh_from_db()
+        self.assertEqual(proj.total_encaisse, 45)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as f:
+            f.write(releve)
+            f.flush()
+            out = StringIO()
+            call_command("reconcile_payments", "banque", f.name, stdout=out)
+            self.assertIn(
+                "2 offre(s) à marquer comme payée(s), pour 50",
+                out.getvalue(),
+            )
+            self.assertEqual(Offre.objects.filter(paye=True).count(), 2)
+            out = StringIO()
+            call_command("reconcile_payments", "banque", f.name, apply=True, stdout=out)
+            self.assertIn("2 offre(s) marquée(s)", out.getvalue())
+        proj.refresh_from_db()
+        self.assertEqual(proj.total_encaisse, 95)
+        self.assertEqual(list(Offre.objects.filter(paye=False)), [o5])
+
+    def test_images(self):
+        """Check the derivatives of the images, and how they are shown."""
+        a, b, c, s = User.objects.all()
+        buffer = BytesIO()
+        Image.new("RGBA", (2000, 1000), "red").save(buffer, "PNG")
+        digest = hashlib.sha256(buffer.getvalue()).hexdigest()[:16]
+        # an upload is resized in the web process, without starting a pool
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media,
+        ), mock.patch(
+            "cagnottesolidaire.images.ProcessPoolExecutor",
+            wraps=ProcessPoolExecutor,
+        ) as pool:
+            proj = Cagnotte.objects.create(
+                name="images",
+                responsable=a,
+                objectif="nothing",
+                finances=100,
+                fin_depot=date.today(),
+                fin_achat=date.today(),
+                image=SimpleUploadedFile("photo.png", buffer.getvalue()),
+            )
+            self.assertTrue(proj.image_derivees)
+            proj.refresh_from_db()
+            self.assertTrue(proj.image_derivees)
+            self.assertEqual(
+                proj.image.name,
+                f"cagnottesolidaire/proj_images_{digest}.png",
+            )
+            for size, width in [("card", 400), ("detail", 800), ("retina", 1600)]:
+                for ext in ["webp", "jpg"]:
+                    name = (
+                        f"{media}/cagnottesolidaire/proj_images_{digest}_{size}.{ext}"
+                    )
+                    with Image.open(name) as image:
+                        self.assertEqual(image.size, (width, width // 2))
+
+            html = self.client.get(reverse("cagnottesolidaire:cagnotte_list"))
+            self.assertContains(
+                html,
+                '<source type="image/webp" srcset="'
+                f"/media/cagnottesolidaire/proj_images_{digest}_card.webp 400w, "
+                f"/media/cagnottesolidaire/proj_images_{digest}_detail.webp 800w",
+            )
+            self.assertContains(html, 'loading="lazy"')
+
+            # not an image: the original is used, until the backfill works
+            with self.assertLogs("cagnottesolidaire.images", "WARNING") as logs:
+                prop = Proposition.objects.create(
+                    name="Pipo",
+                    description="nope",
+                    prix=20,
+                    cagnotte=proj,
+                    responsable=b,
+                    image=SimpleUploadedFile("photo.png", b"not an image"),
+                )
+            self.assertEqual(len(logs.output), 1)
+            self.assertFalse(prop.image_derivees)
+            pool.assert_not_called()
+            html = self.client.get(proj.get_absolute_url())
+            self.assertContains(
+                html,
+                f'<img alt="image pour Pipo" src="/media/{prop.image.name}" '
+                'class="" loading="lazy" />',
+                html=True,
+            )
+            out = StringIO()
+            with self.assertLogs("cagnottesolidaire.images", "WARNING"):
+                call_command("generate_image_derivatives", workers=0, stdout=out)
+            self.assertIn("0 image(s) de proposition", out.getvalue())
+            with open(prop.image.path, "wb") as f:
+                f.write(buffer.getvalue())
+            etag = self.client.get(proj.get_absolute_url())["ETag"]
+            call_command("generate_image_derivatives", workers=0, stdout=out)
+            self.assertIn("1 image(s) de proposition", out.getvalue())
+            # the pages show the derivatives, under a new ETag
+            html = self.client.get(prop.get_absolute_url(), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(html.status_code, 200)
+            self.assertContains(html, "<picture>")
+            call_command("generate_image_derivatives", force=True, stdout=out)
+            self.assertIn("1 image(s) de cagnotte", out.getvalue())
+            pool.assert_called()
+            prop.refresh_from_db()
+            self.assertTrue(prop.image_derivees)
+
+    def test_image_names(self):
+        """Check the images of the old names are renamed with their derivatives."""
+        a, b, c, s = User.objects.all()
+        buffer = BytesIO()
+        Image.new("RGB", (100, 100), "blue").save(buffer, "PNG")
+        digest = hashlib.sha256(buffer.getvalue()).hexdigest()[:16]
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media,
+            CAGNOTTESOLIDAIRE_FRAGMENT_CACHE=True,
+        ):
+            proj = Cagnotte.objects.create(
+                name="noms",
+                responsable=a,
+                objectif="nothing",
+                finances=100,
+                fin_depot=date.today(),
+                fin_achat=date.today(),
+                image=SimpleUploadedFile("photo.png", buffer.getvalue()),
+            )
+            hashed = proj.image.name
+            self.assertTrue(hashed.endswith(f"_{digest}.png"))
+            old = "cagnottesolidaire/proj_noms.png"
+            for suffix in ["", "_card.webp", "_retina.jpg"]:
+                os.rename(
+                    f"{media}/{hashed.replace('.png', suffix or '.png')}",
+                    f"{media}/{old.replace('.png', suffix or '.png')}",
+                )
+            Cagnotte.objects.filter(pk=proj.pk).update(image=old)
+            proj.refresh_from_db()
+            cache = caching.get_cache()
+            versions = [caching.current_version(cache, s) for s in ["noms", "*"]]
+            out = StringIO()
+            call_command("hash_image_names", stdout=out)
+            self.assertIn("1 image(s) de cagnotte renommée(s)", out.getvalue())
+            updated = proj.updated
+            proj.refresh_from_db()
+            self.assertEqual(proj.image.name, hashed)
+            # the cached pages and the validators forget the old names
+            self.assertGreater(proj.updated, updated)
+            for scope, version in zip(["noms", "*"], versions, strict=True):
+                self.assertNotEqual(caching.current_version(cache, scope), version)
+            self.assertEqual(
+                sorted(os.listdir(f"{media}/cagnottesolidaire")),
+                sorted(
+                    f"proj_noms_{digest}{suffix}"
+                    for suffix in [
+                        ".png",
+                        "_card.webp",
+                        "_card.jpg",
+                        "_detail.webp",
+                        "_detail.jpg",
+                        "_retina.webp",
+                        "_retina.jpg",
+                    ]
+                ),
+            )
+            call_command("hash_image_names", stdout=out)
+            self.assertIn("0 image(s) de cagnotte renommée(s)", out.getvalue())
+
+    def test_search(self):
+        """Check the full-text search, its ranking and its pages."""
+        a, b, c, s = User.objects.all()
+        proj = Cagnotte.objects.create(
+            name="Vélos pour l`école",
+            responsable=a,
+            objectif="acheter des vélos",
+            finances=100,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Cours de piano",
+            description="une heure, pour débutants",
+            prix=20,
+            cagnotte=proj,
+            responsable=b,
+        )
+        demande = Demande.objects.create(
+            cagnotte=proj,
+            demandeur=c,
+            description="réparer un vélo",
+        )
+        url = reverse("cagnottesolidaire:recherche")
+
+        def found(q: str, page: int = 1) -> list:
+            response = self.client.get(url, {"q": q, "page": page})
+            self.assertEqual(response.status_code, 200)
+            return [obj for _, obj in response.context["results"]]
+
+        # accents, case and prefixes; names rank above descriptions
+        self.assertEqual(found("VELO"), [proj, demande])
+        self.assertEqual(found("debut"), [prop])
+        self.assertEqual(found("piano cours"), [prop])
+        self.assertEqual(found("piano velo"), [])
+        self.assertEqual(found('"*)'), [])
+        self.assertEqual(self.client.get(url).context["results"], [])
+
+        prop.name = "Cours de guitare"
+        prop.save()
+        self.assertEqual(found("piano"), [])
+        self.assertEqual(found("guitare"), [prop])
+        demande.delete()
+        self.assertEqual(found("vélo"), [proj])
+
+        for i in range(25):
+            Proposition.objects.create(
+                name=f"Guitare {i}",
+                description="cordes",
+                prix=20,
+                cagnotte=proj,
+                responsable=b,
+            )
+        with self.assertNumQueries(2):
+            first = found("guitare")
+        self.assertEqual(len(first), 20)
+        self.assertEqual(len(found("guitare", 2)), 6)
+        self.assertTrue(set(first).isdisjoint(found("guitare", 2)))
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertEqual(out.getvalue(), "27 document(s) indexé(s)\n")
+        self.assertEqual(len(found("guitare", 2)), 6)
+
+        # a rebuild also forgets the rows deleted behind the back of the signals
+        stale = Proposition.objects.filter(name="Guitare 0")
+        document = ("proposition", stale.get().pk)
+        stale._raw_delete(stale.db)
+        self.assertIn(document, search.query("guitare", 30, 0))
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertNotIn(document, search.query("guitare", 30, 0))
+        self.assertEqual(len(found("guitare", 2)), 5)
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite's")
+    def test_indexes(self):
+        """Check the hot queries use the indexes."""
+        a = User.objects.first()
+        proj = Cagnotte.objects.create(
+            name="index",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=a,
+        )
+        for queryset, indexes in [
+            (proj.offres(), ["proposition_cagnotte_prix_idx", "offre_valide_idx"]),
+            (proj.offres().filter(paye=True), ["offre_valide_idx"]),
+            (
+                Offre.objects.filter(proposition=prop, beneficiaire=a),
+                ["offre_beneficiaire_idx"],
+            ),
+            (Offre.objects.filter(beneficiaire=a), ["offre_beneficiaire_idx"]),
+            (prop.offre_set.filter(valide=True), ["offre_valide_idx"]),
+            (
+                proj.proposition_set.with_offer_stats(),
+                ["proposition_cagnotte_prix_idx", "offre_proposition_valide_idx"],
+            ),
+            (proj.proposition_set.disponibles(), ["proposition_disponible_idx"]),
+            (Cagnotte.objects.actives(), ["cagnotte_fin_achat_idx"]),
+        ]:
+            plan = queryset.explain()
+            for index in indexes:
+                self.assertIn(f"INDEX {index} ", plan)
+        # Propositions are already sorted by the index
+        self.assertNotIn("TEMP B-TREE", proj.proposition_set.all().explain())
+
     def test_offrable(self):
         """Test something, I don't know what right now."""
         a, b, c, s = User.objects.all()
@@ -455,3 +1660,631 @@ class TestCagnotte(TestCase):
         self.assertEqual(self.client.get(delete_url).status_code, 200)
         self.client.post(delete_url)
         self.assertEqual(Demande.objects.count(), 0)
+
+    def test_archives(self):
+        """Move old Cagnottes to the archives, keeping their totals and pages."""
+        a, b = User.objects.filter(username__in="ab").order_by("username")
+        today = date.today()
+        cagnottes = [
+            Cagnotte.objects.create(
+                name=name,
+                responsable=a,
+                objectif="nothing",
+                finances=100,
+                fin_depot=fin_achat,
+                fin_achat=fin_achat,
+            )
+            for name, fin_achat in [
+                ("old", today - timedelta(days=800)),
+                ("recent", today - timedelta(days=10)),
+            ]
+        ]
+        for cagnotte in cagnottes:
+            prop = Proposition.objects.create(
+                name=f"prop {cagnotte.name}",
+                description="vélo",
+                prix=10,
+                cagnotte=cagnotte,
+                responsable=a,
+                beneficiaires=3,
+            )
+            for valide, paye in [(True, True), (True, False), (False, False)]:
+                Offre.objects.create(
+                    proposition=prop,
+                    prix=12,
+                    beneficiaire=b,
+                    valide=valide,
+                    paye=paye,
+                )
+            Demande.objects.create(cagnotte=cagnotte, demandeur=b, description="hi")
+        old, recent = cagnottes
+
+        out = StringIO()
+        call_command("archive_cagnottes", jours=365, batch_size=1, stdout=out)
+        self.assertIn("1 cagnotte(s) archivée(s)", out.getvalue())
+        old.refresh_from_db()
+        self.assertTrue(old.archivee)
+        self.assertEqual(Offre.objects.count(), 3)
+        self.assertEqual(Proposition.objects.get().cagnotte, recent)
+        self.assertEqual(Demande.objects.get().cagnotte, recent)
+        archived = old.propositions_archivees.get()
+        self.assertEqual(archived.name, "prop old")
+        self.assertEqual((archived.offres_valides, archived.offres_somme), (2, 24))
+        self.assertEqual(archived.offres.count(), 3)
+        self.assertEqual(old.demandes_archivees.get().description, "hi")
+        self.assertEqual(
+            search.query("vélo", 9, 0),
+            [("proposition", Proposition.objects.get().pk)],
+        )
+
+        # totals are frozen
+        call_command("recompute_totals", stdout=StringIO())
+        old.refresh_from_db()
+        self.assertEqual(
+            (old.nb_offres, old.somme(), old.somme_encaissee()),
+            (2, 24, 12),
+        )
+
+        # read-only page
+        self.client.force_login(a)
+        response = self.client.get(old.get_absolute_url())
+        self.assertTemplateUsed(response, "cagnottesolidaire/cagnotte_archive.html")
+        self.assertContains(response, "prop old")
+        self.assertEqual(len(response.context["offres"]), 2)
+        self.assertNotContains(response, "demande_delete")
+
+        call_command("archive_cagnottes", stdout=out)
+        self.assertIn("0 cagnotte(s) archivée(s)", out.getvalue())
+
+    def test_deadlines(self):
+        """Close the deadlines once, expiring the pending Offres with a summary."""
+        a, b, c, s = User.objects.all()
+        today = date.today()
+        finie, depot, ouverte = (
+            Cagnotte.objects.create(
+                name=name,
+                responsable=a,
+                objectif="nothing",
+                finances=100,
+                fin_depot=fin_depot,
+                fin_achat=fin_achat,
+            )
+            for name, fin_depot, fin_achat in [
+                ("finie", today - timedelta(days=10), today - timedelta(days=1)),
+                ("depot", today - timedelta(days=1), today + timedelta(days=10)),
+                ("ouverte", today, today),
+            ]
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=finie,
+            responsable=b,
+            beneficiaires=2,
+        )
+        acceptee = Offre.objects.create(
+            proposition=prop,
+            prix=20,
+            beneficiaire=b,
+            valide=True,
+        )
+        attente = Offre.objects.create(proposition=prop, prix=20, beneficiaire=c)
+
+        out = StringIO()
+        call_command("process_deadlines", stdout=out)
+        self.assertIn(
+            "1 cagnotte(s) clôturée(s), 1 offre(s) expirée(s), 1 dépôt(s) clos",
+            out.getvalue(),
+        )
+        self.assertEqual(
+            [cagnotte.etat for cagnotte in Cagnotte.objects.order_by("pk")],
+            [Cagnotte.Etat.CLOTUREE, Cagnotte.Etat.DEPOT_CLOS, Cagnotte.Etat.OUVERTE],
+        )
+        attente.refresh_from_db()
+        acceptee.refresh_from_db()
+        self.assertIs(attente.valide, False)
+        self.assertIs(acceptee.valide, True)
+        finie.refresh_from_db()
+        prop.refresh_from_db()
+        self.assertEqual((finie.nb_offres, finie.somme(), prop.restants), (1, 20, 1))
+        self.assertFalse(prop.offrable())
+        self.assertEqual(
+            sorted(OutgoingMail.objects.values_list("sujet", flat=True)),
+            [
+                "Le dépôt des propositions sur votre cagnotte est terminé",
+                "Votre cagnotte est terminée",
+            ],
+        )
+        self.assertIn(
+            "1 offre(s) encore en attente ont expiré",
+            OutgoingMail.objects.get(sujet="Votre cagnotte est terminée").texte,
+        )
+
+        # idempotent
+        call_command("process_deadlines", stdout=out)
+        self.assertIn("0 cagnotte(s) clôturée(s)", out.getvalue())
+        self.assertEqual(OutgoingMail.objects.count(), 2)
+
+        # no more propositions once the deposit is closed
+        self.client.force_login(b)
+        data = {"name": "late", "description": "nope", "prix": "1", "beneficiaires": 1}
+        for cagnotte, status in [(depot, 403), (ouverte, 302)]:
+            url = reverse(
+                "cagnottesolidaire:proposition_create",
+                kwargs={"slug": cagnotte.slug},
+            )
+            self.assertEqual(self.client.post(url, data).status_code, status)
+
+    def test_digests(self):
+        """Notify the new Offres now, or in hourly or daily digests."""
+        a, b, c, s = User.objects.all()
+        Preference.objects.create(user=a, frequence=Preference.Frequence.QUOTIDIENNE)
+        Preference.objects.create(user=b, frequence=Preference.Frequence.HORAIRE)
+        proj = Cagnotte.objects.create(
+            name="digests",
+            responsable=a,
+            objectif="nothing",
+            finances=100,
+            fin_depot=date.today(),
+            fin_achat=date.today() + timedelta(days=10),
+        )
+        props = {
+            responsable: Proposition.objects.create(
+                name=f"prop {responsable}",
+                description="nope",
+                prix=20,
+                cagnotte=proj,
+                responsable=responsable,
+                beneficiaires=0,
+            )
+            for responsable in (a, b, s)
+        }
+        for beneficiaire, responsable in [(c, a), (b, a), (c, b), (c, s)]:
+            self.client.force_login(beneficiaire)
+            url = reverse(
+                "cagnottesolidaire:offre_create",
+                kwargs={"p_slug": proj.slug, "slug": props[responsable].slug},
+            )
+            self.assertEqual(self.client.post(url, {"prix": "21"}).status_code, 302)
+        self.assertEqual(
+            list(OutgoingMail.objects.values_list("destinataire", flat=True)),
+            ["s@example.org"],
+        )
+        self.assertEqual(Notification.objects.count(), 3)
+
+        out = StringIO()
+        call_command("send_digests", "horaire", stdout=out)
+        self.assertIn("1 résumé(s) mis en file", out.getvalue())
+        with CaptureQueriesContext(connection) as queries:
+            call_command("send_digests", "quotidienne", stdout=out)
+        # fetch the notifications, queue the mails, delete the notifications
+        sql = [query["sql"] for query in queries if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(len(sql), 3)
+        digest = OutgoingMail.objects.get(destinataire="a@example.org")
+        self.assertIn("2 nouvelle(s) offre(s)", digest.texte)
+        self.assertIn("prop a", digest.texte)
+        self.assertEqual(
+            OutgoingMail.objects.filter(destinataire="b@example.org").count(),
+            1,
+        )
+        self.assertEqual(Notification.objects.count(), 0)
+
+        # preferences
+        url = reverse("cagnottesolidaire:preferences")
+        self.client.force_login(c)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertRedirects(self.client.post(url, {"frequence": "2"}), url)
+        self.assertEqual(c.preference.frequence, Preference.Frequence.QUOTIDIENNE)
+
+    def test_admin(self):
+        """Check the changelists run the same queries whatever the size, and actions."""
+        self.client.force_login(User.objects.create_superuser("admin"))
+        changelists = [
+            reverse(f"admin:cagnottesolidaire_{model}_changelist")
+            for model in ("cagnotte", "proposition", "offre", "demande", "outgoingmail")
+        ]
+
+        def queries() -> list[int]:
+            counts = []
+            for url in changelists:
+                with CaptureQueriesContext(connection) as context:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                counts.append(len(context))
+            return counts
+
+        for prefix, offres in [("small", 10), ("big", 80)]:
+            call_command(
+                "seed_benchmark_data",
+                users=5,
+                cagnottes=2,
+                propositions=5,
+                offres=offres,
+                demandes=3,
+                prefix=prefix,
+                stdout=StringIO(),
+            )
+            if prefix == "small":
+                small = queries()
+        self.assertEqual(queries(), small)
+
+        # the sortable annotated columns
+        url = changelists[1] + "?o=-7"
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # bulk transitions keep the places and the totals in sync
+        a, b = User.objects.filter(username__in="ab").order_by("username")
+        proj = Cagnotte.objects.create(
+            name="admin",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=10,
+            cagnotte=proj,
+            responsable=a,
+            beneficiaires=2,
+        )
+        pks = [
+            Offre.objects.create(proposition=prop, prix=10, beneficiaire=b).pk
+            for _ in range(3)
+        ]
+        for action, message in [
+            ("accepter", "2 offre(s) acceptée(s)"),
+            ("encaisser", "2 offre(s) payée(s)"),
+        ]:
+            response = self.client.post(
+                changelists[2],
+                {"action": action, "_selected_action": pks},
+                follow=True,
+            )
+            self.assertContains(response, message)
+        prop.refresh_from_db()
+        proj.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+        self.assertEqual(
+            (proj.nb_offres, proj.somme(), proj.somme_encaissee()),
+            (2, 20, 20),
+        )
+
+        # deleting gives back the places and totals of the accepted offres
+        response = self.client.post(
+            changelists[2],
+            {"action": "delete_selected", "_selected_action": pks[1:], "post": "yes"},
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([offre.pk for offre in prop.offre_set.all()], pks[:1])
+        prop.refresh_from_db()
+        proj.refresh_from_db()
+        self.assertEqual(prop.restants, 1)
+        self.assertEqual(
+            (proj.nb_offres, proj.somme(), proj.somme_encaissee()),
+            (1, 10, 10),
+        )
+
+        # deleting demandes moves the validators of their cagnotte on
+        demande = Demande.objects.create(cagnotte=proj, demandeur=b, description="hi")
+        proj.refresh_from_db()
+        modifiees = proj.offres_modifiees
+        response = self.client.post(
+            changelists[3],
+            {
+                "action": "delete_selected",
+                "_selected_action": [demande.pk],
+                "post": "yes",
+            },
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(proj.demande_set.exists())
+        proj.refresh_from_db()
+        self.assertGreater(proj.offres_modifiees, modifiees)
+
+
+class TestBenchmark(TestCase):
+    """Check the synthetic dataset and the benchmark of every named URL."""
+
+    def test_benchmark(self):
+        """Seed a small dataset, and time every URL on it."""
+        call_command(
+            "seed_benchmark_data",
+            users=10,
+            cagnottes=3,
+            propositions=10,
+            offres=200,
+            demandes=5,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Offre.objects.count(), 200)
+        for cagnotte in Cagnotte.objects.all():
+            self.assertEqual(cagnotte.nb_offres, cagnotte.offres().count())
+        for proposition in Proposition.objects.exclude(beneficiaires=0):
+            valides = proposition.offre_set.filter(valide=True).count()
+            self.assertEqual(proposition.restants, proposition.beneficiaires - valides)
+
+        report = benchmark.run(repeat=1)
+        self.assertEqual(
+            set(report),
+            {pattern.name for pattern in urls.urlpatterns},
+        )
+        for result in report.values():
+            self.assertLess(result["status"], 500)
+            if result["status"] != 405:  # POST only
+                self.assertGreater(result["queries"], 0)
+
+
+class TestQueryBudgets(QueryBudgetTestMixin, TestCase):
+    """Check every named URL stays within its query budget."""
+
+    def test_budgets(self):
+        """Request every URL as anonymous, staff, and responsable."""
+        call_command(
+            "seed_benchmark_data",
+            users=10,
+            cagnottes=3,
+            propositions=10,
+            offres=200,
+            demandes=5,
+            stdout=StringIO(),
+        )
+        kwargs = benchmark.url_kwargs()
+        cagnotte = Cagnotte.objects.get(slug=kwargs["cagnotte"]["slug"])
+        staff = User.objects.create_user("staff", is_staff=True)
+        for user in [None, staff, cagnotte.responsable]:
+            if user is not None:
+                self.client.force_login(user)
+            for pattern in urls.urlpatterns:
+                with self.subTest(user=user, url=pattern.name):
+                    self.assertQueryBudget(
+                        reverse(
+                            f"cagnottesolidaire:{pattern.name}",
+                            kwargs=kwargs[pattern.name],
+                        ),
+                    )
+
+    def test_exceeded(self):
+        """Check an exceeded budget fails with the duplicated queries."""
+        url = reverse("cagnottesolidaire:offre_list")
+        self.client.force_login(User.objects.create_user("a"))
+        with self.settings(CAGNOTTESOLIDAIRE_QUERY_BUDGETS={}):
+            with self.assertRaisesMessage(AssertionError, "has no query budget"):
+                self.assertQueryBudget(url)
+            with self.settings(CAGNOTTESOLIDAIRE_QUERY_BUDGET=1), self.assertLogs(
+                "cagnottesolidaire.queries",
+                "WARNING",
+            ) as logs:
+                with self.assertRaisesMessage(AssertionError, "3 queries"):
+                    self.assertQueryBudget(url)
+            self.assertIn("budget of 1", logs.output[0])
+
+
+class TestReplicas(SimpleTestCase):
+    """Check the reads go to the replicas, unless the client has just written."""
+
+    def test_router(self):
+        """Route the requests through the middleware, with one replica."""
+        factory = RequestFactory()
+
+        def view(request):
+            return HttpResponse(router.db_for_read(Cagnotte))
+
+        def get(request, view=view):
+            # process_view is called by the handler, within the middleware
+            def handler(request):
+                return middleware.process_view(request, view, (), {}) or view(request)
+
+            middleware = routers.ReplicaMiddleware(handler)
+            return middleware(request)
+
+        with mock.patch.object(routers, "REPLICAS", ["replica"]):
+            response = get(factory.get("/"))
+            self.assertEqual(response.content, b"replica")
+            self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+            self.assertEqual(router.db_for_read(Cagnotte), "default")
+            self.assertEqual(router.db_for_write(Cagnotte), "default")
+
+            response = get(factory.post("/"))
+            self.assertEqual(response.content, b"default")
+            self.assertEqual(
+                response.cookies[routers.PIN_COOKIE]["max-age"],
+                routers.PIN_SECONDS,
+            )
+
+            pinned = factory.get("/")
+            pinned.COOKIES[routers.PIN_COOKIE] = "1"
+            self.assertEqual(get(pinned).content, b"default")
+
+            response = get(factory.get("/"), routers.use_primary(view))
+            self.assertEqual(response.content, b"default")
+            self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+            self.assertFalse(router.allow_migrate("replica", "cagnottesolidaire"))
+            self.assertTrue(router.allow_migrate("default", "cagnottesolidaire"))
+
+
+class TestAsync(LiveServerTestCase):
+    """Check the async views, and the load test of a running server."""
+
+    def test_async_views(self):
+        """Render a Cagnotte in the thread pool."""
+        guy = User.objects.create_user("a")
+        cagnotte = Cagnotte.objects.create(
+            name="async",
+            responsable=guy,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        self.assertFalse(
+            asyncio.iscoroutinefunction(views.CagnotteDetailView.as_view()),
+        )
+        with self.settings(CAGNOTTESOLIDAIRE_ASYNC_VIEWS=True):
+            view = views.CagnotteDetailView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertEqual(view.view_class, views.CagnotteDetailView)
+        request = RequestFactory().get(cagnotte.get_absolute_url())
+        request.user = guy
+        response = async_to_sync(view)(request, slug=cagnotte.slug)
+        self.assertContains(response, "async")
+        with self.assertRaises(Http404):
+            async_to_sync(view)(request, slug="nope")
+
+    def test_load(self):
+        """Load the read-only views of the live server."""
+        call_command(
+            "seed_benchmark_data",
+            users=10,
+            cagnottes=2,
+            propositions=4,
+            offres=20,
+            demandes=2,
+            stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command(
+            "load_test",
+            self.live_server_url,
+            clients=2,
+            requests=4,
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report), set(load_test.READ_VIEWS))
+        for result in report.values():
+            self.assertEqual((result["requests"], result["errors"]), (4, 0))
+            self.assertGreater(result["rps"], 0)
+            self.assertGreaterEqual(result["p99_ms"], result["median_ms"])
+
+
+class TestConcurrency(TransactionTestCase):
+    """Check the Propositions can not be oversold by concurrent validations."""
+
+    def test_no_oversell(self):
+        """Validate lots of Offres at the same time on a limited Proposition."""
+        a, b = (User.objects.create_user(guy) for guy in "ab")
+        proj = Cagnotte.objects.create(
+            name="rush",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=a,
+            beneficiaires=5,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=22, beneficiaire=b).pk
+            for _ in range(20)
+        ]
+        barrier = threading.Barrier(len(offres))
+        results = []
+
+        def valider(pk: int):
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        offre = Offre.objects.get(pk=pk)
+                        offre.valide = True
+                        offre.save()
+                    except ValidationError:
+                        results.append(False)
+                        return
+                    except OperationalError:  # SQLite locks
+                        time.sleep(0.01)
+                    else:
+                        results.append(True)
+                        return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=valider, args=(pk,)) for pk in offres]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(results.count(False), 15)
+        self.assertEqual(Offre.objects.filter(valide=True).count(), 5)
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+        proj.refresh_from_db()
+        self.assertEqual((proj.nb_offres, proj.somme()), (5, 110))
+
+    def test_save_during_acceptance(self):
+        """Accept an Offre while its Proposition is being saved, before its UPDATE."""
+        a, b = (User.objects.create_user(guy) for guy in "ab")
+        proj = Cagnotte.objects.create(
+            name="edit",
+            responsable=a,
+            objectif="nothing",
+            finances=43,
+            fin_depot=date.today(),
+            fin_achat=date.today(),
+        )
+        prop = Proposition.objects.create(
+            name="Pipo",
+            description="nope",
+            prix=20,
+            cagnotte=proj,
+            responsable=a,
+            beneficiaires=2,
+        )
+        offres = [
+            Offre.objects.create(proposition=prop, prix=22, beneficiaire=b).pk
+            for _ in range(3)
+        ]
+
+        def accepter(pk: int):
+            try:
+                Offre.objects.filter(pk=pk).accepter()
+            finally:
+                connection.close()
+
+        def save_during_acceptance(proposition: Proposition, pk: int):
+            def interleave(**kwargs):
+                thread = threading.Thread(target=accepter, args=(pk,))
+                thread.start()
+                thread.join()
+
+            # between the start of the save and its UPDATE
+            pre_save.connect(interleave, sender=Proposition)
+            try:
+                proposition.save()
+            finally:
+                pre_save.disconnect(interleave, sender=Proposition)
+
+        # an edit of the description keeps the place taken in between
+        edit = Proposition.objects.get(pk=prop.pk)
+        edit.description = "yep"
+        save_during_acceptance(edit, offres[0])
+        prop.refresh_from_db()
+        self.assertEqual((prop.description, prop.restants), ("yep", 1))
+
+        # a new number of beneficiaires counts it too
+        edit = Proposition.objects.get(pk=prop.pk)
+        edit.beneficiaires = 3
+        save_during_acceptance(edit, offres[1])
+        self.assertEqual(edit.restants, 1)
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 1)
+
+        # so the last place can not be oversold
+        Offre.objects.filter(pk=offres[2]).accepter()
+        prop.refresh_from_db()
+        self.assertEqual(prop.restants, 0)
+        self.assertEqual(Offre.objects.filter(valide=True).count(), 3)
@@ -0,0 +1,8 @@
+"""WSGI entrypoint of Cagnotte Solidaire's test project, for sync workers."""
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testproject.settings")
+
+application = get_wsgi_application()